@@ -0,0 +1,193 @@
+# Authors: Josiah Bartlett and Tom Joyce
+# Purpose: time- and evaluation-budgeted TSP search that can always hand back its best tour so far
+
+import threading
+import timeit
+import numpy as np
+from construction import nearestNeighborTour
+from simannealing import SimAnnealingTSPGraph, SimAnnealingTSPAgent
+from genetic import evolve
+from instrumentation import Observer
+from lowerbound import heldKarpBound, optimalityGap
+
+
+class Budget(object):
+
+    """
+    @param seconds: wall-clock limit (None for no limit)
+    @param evaluations: limit on moves or tours scored (None for no limit)
+    Both limits are checked once per temperature or generation, so a run can
+    overshoot them by one iteration. cancel() may be called from any thread.
+    """
+    def __init__(self, seconds=None, evaluations=None):
+        self.seconds = seconds
+        self.evaluations = evaluations
+        self.started = None
+        self.cancelled = threading.Event()
+
+    def start(self):
+        self.started = timeit.default_timer()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    """
+    @return: seconds since start() was called
+    """
+    def elapsed(self):
+        return timeit.default_timer() - self.started if self.started is not None else 0.0
+
+    """
+    @param evaluations: evaluations spent so far
+    @return: True once the search has to stop
+    """
+    def exhausted(self, evaluations):
+        if self.cancelled.is_set():
+            return True
+        if self.evaluations is not None and evaluations >= self.evaluations:
+            return True
+        return self.seconds is not None and self.elapsed() >= self.seconds
+
+
+class AnytimeSearch(Observer):
+
+    """
+    @param graph: a weighted graph
+    @param budget: the Budget to stop at
+    @param gap: also stop once the best tour is certified within this relative gap of optimal
+    @param bound: lower bound on the optimal length (default: heldKarpBound, computed at the start of run)
+    Runs annealing restarts or GA runs back to back until the budget is spent,
+    keeping the best tour seen. run() blocks; progress(), result() and cancel()
+    are safe to call from other threads while it runs.
+    """
+    def __init__(self, graph, budget, gap=None, bound=None):
+        self.graph = graph
+        self.budget = budget
+        self.gap = gap
+        self.bound = bound
+        self.lock = threading.Lock()
+        self.bestTour = None
+        self.bestLength = float('inf')
+        self.spent = 0       # evaluations of the runs already finished
+        self.current = None  # RunStats of the run in progress
+        self.runs = 0
+        self.done = threading.Event()
+
+    """
+    @param tour: a tour, as a list of vertices
+    @param length: its length
+    """
+    def offer(self, tour, length):
+        if length < self.bestLength:
+            with self.lock:
+                self.bestTour = list(tour)
+                self.bestLength = length
+
+    def started(self, stats):
+        self.current = stats
+
+    def improved(self, stats, tour):
+        self.offer(tour, stats.best)
+
+    def progressed(self, stats):
+        return self.stopping(self.spent + stats.evaluations)
+
+    """
+    @param evaluations: evaluations spent so far
+    @return: True once the budget is spent or the best tour is within the wanted gap
+    """
+    def stopping(self, evaluations):
+        if self.gap is not None and self.bound is not None and optimalityGap(self.bestLength, self.bound) <= self.gap:
+            return True
+        return self.budget.exhausted(evaluations)
+
+    def finished(self, stats):
+        with self.lock:
+            self.spent += max(1, stats.evaluations) # every run counts, so no restart is free
+            self.current = None
+            self.runs += 1
+
+    def cancel(self):
+        self.budget.cancel()
+
+    """
+    @return: snapshot of the search: elapsed seconds, evaluations, finished runs,
+    best length so far, the lower bound and certified gap (None without a bound) and
+    whether run() has returned
+    """
+    def progress(self):
+        with self.lock:
+            current = self.current
+            evaluations = self.spent + (current.evaluations if current is not None else 0)
+            return {'elapsed': self.budget.elapsed(), 'evaluations': evaluations, 'runs': self.runs,
+                    'best': self.bestLength, 'bound': self.bound,
+                    'gap': optimalityGap(self.bestLength, self.bound) if self.bound is not None else None,
+                    'done': self.done.is_set()}
+
+    """
+    @return: (best tour so far, its length); (None, inf) before the first tour is known
+    """
+    def result(self):
+        with self.lock:
+            return (self.bestTour, self.bestLength)
+
+    """
+    @param solver: 'anneal' (restarts of the annealing agent) or 'evolve' (back-to-back GA runs)
+    @param seed: seed for the whole search
+    @param construct: start from a nearest-neighbor tour, so there is a result right away
+    @param schedule: cooling schedule of the annealing agent, an object or name from the cooling module
+    (default: the fixed schedule)
+    @param options: passed on to evolve (target_score defaults to 0, i.e. run until the budget ends)
+    @return: (best tour, its length)
+    """
+    def run(self, solver='anneal', seed=None, construct=True, schedule=None, **options):
+        if solver not in ('anneal', 'evolve'):
+            raise ValueError("unknown solver: %s" % solver)
+        self.budget.start()
+        self.done.clear()
+        seeds = np.random.SeedSequence(seed)
+        try:
+            tspgraph = SimAnnealingTSPGraph(self.graph)
+            if construct and len(tspgraph.pathlist) > 0:
+                (tour, length) = nearestNeighborTour(self.graph, tspgraph.pathlist[0])
+                self.offer(tour, length)
+                tspgraph.pathlist, tspgraph.length = tour, length
+            if self.gap is not None and self.bound is None:
+                self.bound = heldKarpBound(self.graph, upper=self.bestLength if self.bestTour else None)
+            if len(tspgraph.pathlist) < 4: # every tour is optimal, and neither solver has a move to make
+                self.offer(tspgraph.pathlist, tspgraph.length)
+                return self.result()
+            if solver == 'anneal':
+                agent = SimAnnealingTSPAgent(seed=int(seeds.generate_state(1)[0]), schedule=schedule)
+                shuffle = not construct
+                while not self.stopping(self.spent):
+                    agent.anneal(tspgraph, observer=self, shuffle=shuffle)
+                    shuffle = True
+            else:
+                options.setdefault('target_score', self.bound * (1 + self.gap) if self.gap is not None else 0)
+                while not self.stopping(self.spent):
+                    (best, score) = evolve(self.graph, seed=seeds.spawn(1)[0], observer=self, **options)
+                    if score <= options['target_score']:
+                        break
+        finally:
+            self.done.set()
+        return self.result()
+
+
+# Anytime solve: search until the deadline, the evaluation budget, the wanted gap or a cancel, then
+# return the best tour found. Pass in an AnytimeSearch to poll or cancel it from another thread.
+# @param graph: a weighted graph
+# @param seconds: wall-clock budget
+# @param evaluations: budget of moves or tours scored
+# @param solver: 'anneal' or 'evolve'
+# @param seed: seed for the search
+# @param gap: also stop once the best tour is certified within this relative gap of optimal
+# @param search: an existing AnytimeSearch to run (its budget replaces seconds, evaluations and gap)
+# @param options: passed on to AnytimeSearch.run
+# @return: (best tour, its length)
+def solve(graph, seconds=None, evaluations=None, solver='anneal', seed=None, gap=None, search=None, **options):
+    if search is None:
+        if seconds is None and evaluations is None:
+            raise ValueError("solve needs a time or evaluation budget")
+        search = AnytimeSearch(graph, Budget(seconds, evaluations), gap)
+    return search.run(solver, seed, **options)
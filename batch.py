@@ -0,0 +1,308 @@
+# Authors: Josiah Bartlett and Tom Joyce
+# Purpose: solve streams of many small instances on a persistent pool of processes, with bounded in-flight work
+
+import asyncio
+import os
+import threading
+import timeit
+from collections import namedtuple, deque
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import numpy as np
+from weightedgraph import WeightedGraph
+from euclideangraph import EuclideanGraph
+from construction import nearestNeighborTour
+from localsearch import optimizeTour
+from heldkarp import heldKarp
+from branchbound import branchAndBound
+from experiments import annealRestarts
+from genetic import evolve
+
+# The outcome of one instance: the id it was given, the tour found (a list of
+# vertices), its length, the seconds spent solving it, and the error message
+# if it could not be solved (then tour and length are None)
+BatchResult = namedtuple('BatchResult', ['id', 'tour', 'length', 'elapsed', 'error'])
+
+# Largest instance the 'auto' solver solves exactly with Held-Karp
+AUTO_EXACT_LIMIT = 12
+
+# Largest instance the 'exact' solver gives to Held-Karp rather than branch and bound
+HELD_KARP_LIMIT = 16
+
+# The solver name and options of each worker process, set up once by _initWorker
+_workerSettings = None
+
+
+# @param instance: a weighted graph, an (n x n) distance matrix or (n x 2) array of points
+# @return: the graph to solve
+def graphOf(instance):
+    if not isinstance(instance, np.ndarray):
+        return instance
+    if instance.ndim == 2 and instance.shape[0] == instance.shape[1]:
+        return WeightedGraph.fromMatrix(instance)
+    if instance.ndim == 2 and instance.shape[1] == 2:
+        return EuclideanGraph(instance)
+    raise ValueError("an array instance must be a square distance matrix or n x 2 points, not %s" % (instance.shape,))
+
+# @param graph: a weighted graph
+# @param solver: 'auto', 'greedy', 'local', 'exact', 'anneal' or 'evolve'
+# @param seed: seed for the randomized solvers
+# @param options: passed on to annealRestarts (e.g. its cooling schedule) or evolve (evolve needs target_score)
+# @return: (tour list, its length)
+def solveInstance(graph, solver='auto', seed=None, **options):
+    vertices = graph.vertices()
+    n = len(vertices)
+    if solver == 'auto':
+        solver = 'exact' if n <= AUTO_EXACT_LIMIT else 'local'
+    if n == 0:
+        return ([], 0)
+    if solver == 'greedy':
+        return nearestNeighborTour(graph, vertices[0])
+    if solver == 'local':
+        (tour, length) = nearestNeighborTour(graph, vertices[0])
+        return optimizeTour(graph, tour, k=min(10, n - 1)) if n >= 5 else (tour, length)
+    if solver == 'exact':
+        if n <= HELD_KARP_LIMIT:
+            return heldKarp(graph)
+        return branchAndBound(graph)[:2]
+    if solver == 'anneal':
+        return annealRestarts(graph, seed, **options)
+    if solver == 'evolve':
+        (best, length) = evolve(graph, seed=seed, **options)
+        return (best.pathlist, length)
+    raise ValueError("unknown solver: %s" % solver)
+
+# @param settings: (solver name, solver options)
+# Runs once in each worker, so the settings are shipped once per process rather than per task
+def _initWorker(settings):
+    global _workerSettings
+    _workerSettings = settings
+
+# @param task: list of (id, instance, seed)
+# @param settings: (solver name, solver options)
+# @return: list of the BatchResults of the task's instances
+def _solveTask(task, settings):
+    (solver, options) = settings
+    results = []
+    for (id, instance, seed) in task:
+        start = timeit.default_timer()
+        try:
+            (tour, length) = solveInstance(graphOf(instance), solver, seed, **options)
+            results.append(BatchResult(id, tour, length, timeit.default_timer() - start, None))
+        except Exception as error:
+            results.append(BatchResult(id, None, None, timeit.default_timer() - start,
+                                       "%s: %s" % (type(error).__name__, error)))
+    return results
+
+# @param task: list of (id, instance, seed)
+# @return: _solveTask on the worker's settings
+def _solveInWorker(task):
+    return _solveTask(task, _workerSettings)
+
+
+class BatchSolver(object):
+
+    """
+    @param solver: 'auto' (Held-Karp up to AUTO_EXACT_LIMIT vertices, else nearest neighbor
+    plus 2-opt/Or-opt), 'greedy', 'local', 'exact', 'anneal' or 'evolve'
+    @param workers: number of worker processes (None for one per core, 1 to solve in this process)
+    @param inFlight: most tasks submitted and not yet collected (default two per worker); the
+    instances are only pulled from their iterable as results are taken, so a generator of
+    instances is never run far ahead of the solvers
+    @param chunk: instances per task; several small instances per task amortize the
+    inter-process round trip, which is otherwise longer than solving them
+    @param seed: master seed; the k-th instance of every solve call gets the same seed
+    @param options: passed on to the solver (see solveInstance)
+    The worker processes start on first use and are reused by every solve call until close.
+    """
+    def __init__(self, solver='auto', workers=None, inFlight=None, chunk=1, seed=None, **options):
+        self.settings = (solver, options)
+        self.workers = workers
+        self.inFlight = inFlight
+        self.chunk = max(1, chunk)
+        self.seed = seed
+        self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+    """
+    Shuts the worker processes down
+    """
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+            self.pool = None
+
+    """
+    @param instances: iterable of instances (see graphOf) or of (id, instance) pairs;
+    bare instances are numbered from 0
+    @return: generator of lists of (id, instance, seed), chunk instances each
+    """
+    def __tasks(self, instances):
+        seeds = np.random.SeedSequence(self.seed)
+        task = []
+        for (k, instance) in enumerate(instances):
+            if isinstance(instance, tuple) and len(instance) == 2:
+                (id, instance) = instance
+            else:
+                id = k
+            task.append((id, instance, int(seeds.spawn(1)[0].generate_state(1, np.uint64)[0])))
+            if len(task) == self.chunk:
+                yield task
+                task = []
+        if task:
+            yield task
+
+    """
+    @param instances: iterable of instances (see graphOf) or of (id, instance) pairs
+    @return: generator of BatchResults, in the order they complete
+    """
+    def solve(self, instances):
+        tasks = self.__tasks(instances)
+        if self.workers == 1:
+            for task in tasks:
+                for result in _solveTask(task, self.settings):
+                    yield result
+            return
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_initWorker,
+                                            initargs=(self.settings,))
+        limit = self.inFlight or 2 * (self.workers or os.cpu_count() or 1)
+        pending = set()
+        try:
+            for task in tasks:
+                pending.add(self.pool.submit(_solveInWorker, task))
+                while len(pending) >= limit:
+                    (done, pending) = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        for result in future.result():
+                            yield result
+            while pending:
+                (done, pending) = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    for result in future.result():
+                        yield result
+        finally:
+            for future in pending:
+                future.cancel()
+
+    """
+    @param instances: iterable of instances (see graphOf) or of (id, instance) pairs
+    @param buffered: most results waiting for the consumer before the solving pauses
+    @return: an AsyncBatch: use it with async for to receive the BatchResults as they complete
+    """
+    def solveAsync(self, instances, buffered=64):
+        return AsyncBatch(self.solve(instances), buffered)
+
+
+class AsyncBatch(object):
+
+    """
+    @param results: generator of BatchResults, e.g. from BatchSolver.solve
+    @param buffered: most results waiting for the consumer; the generator blocks beyond that
+    An async iterator over the results: the generator runs in a thread and hands each
+    result to the event loop through a bounded queue, so the loop is never blocked and a
+    slow consumer holds back the solving instead of letting results pile up.
+    Must be created and iterated on the thread running the event loop; call cancel
+    when leaving the loop before the end, so the remaining work is dropped.
+    """
+    def __init__(self, results, buffered=64):
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=buffered)
+        self.held = deque() # items taken off the queue for an awaitable that was cancelled, served first
+        self.cancelled = False
+        self.thread = threading.Thread(target=self.__produce, args=(results,))
+        self.thread.daemon = True
+        self.thread.start()
+
+    """
+    @param results: generator of BatchResults
+    Runs in the producer thread; ends the queue with ('done', None) or ('error', exception)
+    """
+    def __produce(self, results):
+        try:
+            for result in results:
+                asyncio.run_coroutine_threadsafe(self.queue.put(('result', result)), self.loop).result()
+                if self.cancelled:
+                    break
+            ending = ('done', None)
+        except Exception as error:
+            ending = ('error', error)
+        finally:
+            results.close()
+        if not self.cancelled:
+            asyncio.run_coroutine_threadsafe(self.queue.put(ending), self.loop).result()
+
+    """
+    Stops the solving: the generator is closed, which drops the tasks not yet started.
+    The pool of a BatchSolver.solveAsync stays up for its next solve call until that
+    BatchSolver is closed; solveBatchAsync shuts its own pool down.
+    """
+    def cancel(self):
+        self.cancelled = True
+        self.held.clear()
+        while not self.queue.empty(): # unblock the producer if it waits for room
+            self.queue.get_nowait()
+
+    def __aiter__(self):
+        return self
+
+    """
+    @return: an awaitable of the next BatchResult (raising StopAsyncIteration after the last)
+    """
+    def __anext__(self):
+        future = self.loop.create_future()
+        if self.held:
+            self.__settle(self.held.popleft(), future)
+            return future
+        getting = self.loop.create_task(self.queue.get())
+        getting.add_done_callback(lambda got: self.__deliver(got, future))
+        future.add_done_callback(lambda future: getting.cancel() if future.cancelled() else None)
+        return future
+
+    """
+    @param got: the finished queue.get task
+    @param future: the awaitable handed out by __anext__
+    An item taken for an awaitable cancelled meanwhile (e.g. by asyncio.wait_for) is
+    held back for the next call rather than lost
+    """
+    def __deliver(self, got, future):
+        if got.cancelled():
+            return
+        if future.cancelled():
+            self.held.appendleft(got.result())
+            return
+        self.__settle(got.result(), future)
+
+    """
+    @param item: (kind, value) from the queue
+    @param future: the awaitable handed out by __anext__
+    """
+    def __settle(self, item, future):
+        (kind, value) = item
+        if kind == 'result':
+            future.set_result(value)
+            return
+        self.held.appendleft(item) # later calls end the same way
+        future.set_exception(StopAsyncIteration() if kind == 'done' else value)
+
+
+# Solve a stream of instances on a pool of processes, yielding results as they complete
+# @param instances: iterable of instances (see graphOf) or of (id, instance) pairs
+# @param options: passed on to BatchSolver
+# @return: generator of BatchResults; the pool is shut down once it is exhausted or closed
+def solveBatch(instances, **options):
+    with BatchSolver(**options) as batch:
+        for result in batch.solve(instances):
+            yield result
+
+# Asynchronous solveBatch, for code running in an event loop:
+#     async for result in solveBatchAsync(instances, workers=4): ...
+# @param instances: iterable of instances (see graphOf) or of (id, instance) pairs
+# @param options: passed on to BatchSolver
+# @return: an AsyncBatch of BatchResults
+def solveBatchAsync(instances, buffered=64, **options):
+    return AsyncBatch(solveBatch(instances, **options), buffered)
@@ -0,0 +1,179 @@
+# Authors: Josiah Bartlett and Tom Joyce
+# Purpose: reproducible benchmarks of the TSP solvers, with JSON output and regression checks
+
+import argparse
+import json
+import platform
+import sys
+import time
+import timeit
+import numpy as np
+from graphGenerator import graphGenerator
+from simannealing import SimAnnealingTSPGraph, SimAnnealingTSPAgent
+from cooling import schedules
+from genetic import evolve
+from experiments import runSeeds
+from heldkarp import heldKarp
+
+# Default instance matrix: (kind, sizes). Random-weight instances need a dense
+# n x n matrix, so they stop short of the largest Euclidean size.
+INSTANCES = [('random', (10, 100, 1000)), ('euclidean', (10, 100, 1000, 10000))]
+SOLVERS = ('greedy', 'anneal', 'evolve')
+# Instances up to this size are also solved exactly, to report each solver's ratio to optimal
+EXACT_LIMIT = 16
+
+
+# @param kind: 'random' (integer weights in [20, 100)) or 'euclidean' (points in [0, 1000)^2)
+# @param n: number of vertices
+# @param seed: seed of the instance
+# @return: the weighted graph of that instance
+def makeInstance(kind, n, seed):
+    if kind == 'random':
+        return graphGenerator(n, 20, 100, dense=True, seed=seed).wgraph
+    elif kind == 'euclidean':
+        return graphGenerator(n, 0, 1000, euclidean=True, seed=seed).wgraph
+    raise ValueError("unknown instance kind: %s" % kind)
+
+# @param graph: a weighted graph
+# @param solver: 'greedy', 'anneal' or 'evolve'
+# @param seed: seed for the run
+# @param greedyLength: greedy tour length, the target score for evolve
+# @param maxGenerations: generation budget for evolve
+# @param schedule: name of the cooling schedule for anneal
+# @return: (tour length, tour evaluations or None, seconds)
+def timeSolver(graph, solver, seed, greedyLength, maxGenerations, schedule='fixed'):
+    start = timeit.default_timer()
+    if solver == 'greedy':
+        (tour, length) = graph.greedytsp(graph.vertices()[0])
+        evaluations = None
+    elif solver == 'anneal':
+        agent = SimAnnealingTSPAgent(seed=seed, schedule=schedule)
+        length = agent.anneal(SimAnnealingTSPGraph(graph)).length
+        evaluations = agent.evaluations
+    elif solver == 'evolve':
+        (best, length) = evolve(graph, greedyLength, selection='tournament',
+                                max_generations=maxGenerations, seed=seed)
+        evaluations = best.evaluations
+    else:
+        raise ValueError("unknown solver: %s" % solver)
+    return (length, evaluations, timeit.default_timer() - start)
+
+# @param values: list of numbers
+# @return: dictionary of their minimum, mean, maximum and standard deviation
+def _stats(values):
+    values = np.asarray(values, dtype=np.float64)
+    return {'min': values.min().item(), 'mean': values.mean().item(),
+            'max': values.max().item(), 'std': values.std().item()}
+
+# Run every solver on every instance of the matrix
+# @param instances: list of (kind, sizes)
+# @param solvers: names of the solvers to time
+# @param repeats: runs of each solver on each instance
+# @param seed: master seed for the instances and runs
+# @param maxGenerations: generation budget for evolve
+# @param log: stream for progress lines (None for silence)
+# @param exactLimit: largest instance to solve exactly with Held-Karp
+# @param schedule: name of the cooling schedule for anneal; reports made with another
+# schedule are not comparable for anneal
+# @return: a JSON-serializable report
+def runBenchmarks(instances=INSTANCES, solvers=SOLVERS, repeats=3, seed=0, maxGenerations=200, log=None,
+                  exactLimit=EXACT_LIMIT, schedule='fixed'):
+    results = []
+    for (kind, sizes) in instances:
+        for n in sizes:
+            instanceSeed = runSeeds([seed, n, len(kind)], 1)[0]
+            graph = makeInstance(kind, n, instanceSeed)
+            greedyLength = graph.greedytsp(graph.vertices()[0])[1]
+            optimal = heldKarp(graph)[1] if n <= exactLimit else None
+            for solver in solvers:
+                runs = [timeSolver(graph, solver, s, greedyLength, maxGenerations, schedule)
+                        for s in runSeeds([seed, n, len(kind), len(solver)], repeats)]
+                lengths = [r[0] for r in runs]
+                seconds = [r[2] for r in runs]
+                evaluations = [r[1] for r in runs if r[1] is not None]
+                result = {'kind': kind, 'n': n, 'seed': instanceSeed, 'solver': solver, 'repeats': repeats,
+                          'length': _stats(lengths), 'seconds': _stats(seconds),
+                          'ratioToGreedy': float(np.mean(lengths)) / greedyLength if greedyLength else 1.0,
+                          'optimal': optimal,
+                          'ratioToOptimal': float(np.mean(lengths)) / optimal if optimal else None,
+                          'evaluationsPerSecond': float(sum(evaluations)) / sum(seconds) if evaluations and sum(seconds) > 0 else None}
+                results.append(result)
+                if log is not None:
+                    log.write("%-9s n=%-6d %-7s mean length %.1f  mean time %.4fs\n"
+                              % (kind, n, solver, result['length']['mean'], result['seconds']['mean']))
+    return {'meta': {'python': platform.python_version(), 'numpy': np.__version__,
+                     'machine': platform.machine(), 'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                     'seed': seed, 'repeats': repeats, 'maxGenerations': maxGenerations, 'exactLimit': exactLimit,
+                     'schedule': schedule},
+            'results': results}
+
+# @param current, baseline: reports from runBenchmarks
+# @param throughputTolerance: allowed relative drop in evaluations per second
+# @param qualityTolerance: allowed relative rise in mean tour length
+# @return: list of human-readable regressions (empty if none); anneal is skipped when the
+# reports used different cooling schedules (reports without one used the fixed schedule)
+def compare(current, baseline, throughputTolerance=0.2, qualityTolerance=0.02):
+    key = lambda r: (r['kind'], r['n'], r['solver'])
+    previous = {key(r): r for r in baseline['results']}
+    sameSchedule = current['meta'].get('schedule', 'fixed') == baseline['meta'].get('schedule', 'fixed')
+    regressions = []
+    for result in current['results']:
+        old = previous.get(key(result))
+        if old is None or (result['solver'] == 'anneal' and not sameSchedule):
+            continue
+        name = "%s n=%d %s" % key(result)
+        new, was = result['length']['mean'], old['length']['mean']
+        if new > was * (1 + qualityTolerance):
+            regressions.append("%s: mean length %.2f -> %.2f (+%.1f%%)" % (name, was, new, 100.0 * (new / was - 1)))
+        new, was = result['evaluationsPerSecond'], old['evaluationsPerSecond']
+        if new is not None and was and new < was * (1 - throughputTolerance):
+            regressions.append("%s: %.0f -> %.0f evaluations/s (%.1f%%)" % (name, was, new, 100.0 * (new / was - 1)))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the TSP solvers")
+    commands = parser.add_subparsers(dest='command')
+    run = commands.add_parser('run', help="run the benchmark matrix and write JSON")
+    run.add_argument('--out', default='-', help="output file ('-' for stdout)")
+    run.add_argument('--sizes', type=int, nargs='+', help="sizes to use for every instance kind")
+    run.add_argument('--kinds', nargs='+', default=[k for (k, s) in INSTANCES], choices=[k for (k, s) in INSTANCES])
+    run.add_argument('--solvers', nargs='+', default=list(SOLVERS), choices=SOLVERS)
+    run.add_argument('--repeats', type=int, default=3)
+    run.add_argument('--seed', type=int, default=0)
+    run.add_argument('--max-generations', type=int, default=200)
+    run.add_argument('--exact-limit', type=int, default=EXACT_LIMIT, help="largest size solved exactly")
+    run.add_argument('--schedule', default='fixed', choices=sorted(schedules), help="cooling schedule for anneal")
+    check = commands.add_parser('compare', help="flag regressions against a baseline report")
+    check.add_argument('current')
+    check.add_argument('baseline')
+    check.add_argument('--throughput-tolerance', type=float, default=0.2)
+    check.add_argument('--quality-tolerance', type=float, default=0.02)
+    args = parser.parse_args(argv)
+
+    if args.command == 'run':
+        instances = [(k, tuple(args.sizes) if args.sizes else dict(INSTANCES)[k]) for k in args.kinds]
+        report = runBenchmarks(instances, args.solvers, args.repeats, args.seed, args.max_generations, sys.stderr,
+                               args.exact_limit, args.schedule)
+        if args.out == '-':
+            json.dump(report, sys.stdout, indent=2)
+        else:
+            with open(args.out, 'w') as f:
+                json.dump(report, f, indent=2)
+        return 0
+    elif args.command == 'compare':
+        with open(args.current) as f:
+            current = json.load(f)
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(current, baseline, args.throughput_tolerance, args.quality_tolerance)
+        for line in regressions:
+            print("REGRESSION " + line)
+        if not regressions:
+            print("no regressions")
+        return 1 if regressions else 0
+    parser.print_help()
+    return 2
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,156 @@
+# Authors: Josiah Bartlett and Tom Joyce
+# Purpose: exact TSP for mid-sized instances by depth-first branch and bound with 1-tree penalties
+
+import math
+import timeit
+import numpy as np
+from construction import nearestNeighborTour
+from localsearch import optimizeTour
+from lowerbound import heldKarpPenalties, integralWeights, optimalityGap
+
+
+# Prim's algorithm on a subset of the vertices of a dense matrix
+# @param weights: dense (penalized) weight matrix
+# @param ids: array of the vertex ids to span
+# @return: weight of their minimum spanning tree
+def _treeWeight(weights, ids):
+    k = len(ids)
+    if k < 2:
+        return 0.0
+    key = weights[ids[0], ids].copy()
+    done = np.zeros(k, dtype=bool)
+    done[0] = True
+    key[0] = np.inf
+    total = 0.0
+    for step in range(k - 1):
+        i = int(np.argmin(key))
+        total += key[i]
+        done[i] = True
+        key[i] = np.inf
+        row = weights[ids[i], ids]
+        row[done] = np.inf
+        np.minimum(key, row, out=key)
+    return total
+
+
+class BranchAndBound(object):
+
+    """
+    @param graph: a weighted graph (its dense matrix is used)
+    @param nodeLimit: most search nodes to expand (None for no limit)
+    @param timeLimit: most seconds to search (None for no limit)
+    @param incumbent: starting tour, as a list of vertices (default: nearest neighbor improved by 2-opt/Or-opt)
+    @param iterations: subgradient steps for the root penalties
+    Tours are grown depth-first from vertex id 0. With the root's Held-Karp penalties pi
+    and the penalized weights w'(i, j) = w(i, j) + pi[i] + pi[j], every tour that extends
+    the path 0..last with the vertex j costs at least
+        w'(path) + w'(last, j) + MST'(unvisited + {0}) - 2 sum(pi),
+    since the rest of the tour is a spanning path of those vertices. All children of a
+    node share the unvisited set, so one spanning tree bounds them all. Children are
+    tried nearest first and dropped as soon as their bound reaches the incumbent.
+    """
+    def __init__(self, graph, nodeLimit=None, timeLimit=None, incumbent=None, iterations=100):
+        self.graph = graph
+        self.nodeLimit = nodeLimit
+        self.timeLimit = timeLimit
+        self.incumbent = incumbent
+        self.iterations = iterations
+        self.nodes = 0         # nodes expanded
+        self.pruned = 0        # nodes cut off by their bound
+        self.trees = 0         # spanning trees computed
+        self.improvements = 0  # times the incumbent got shorter
+        self.elapsed = 0.0
+        self.rootBound = None
+        self.lowerBound = None
+
+    """
+    @return: (best tour found, its length, certified gap); the gap is 0 once the search is complete
+    """
+    def solve(self):
+        start = timeit.default_timer()
+        graph = self.graph
+        n = len(graph.vertices())
+        if self.incumbent is None:
+            (tour, length) = nearestNeighborTour(graph, graph.vertices()[0]) if n else ([], 0)
+            if n >= 5:
+                (tour, length) = optimizeTour(graph, tour, k=min(10, n - 1))
+        else:
+            (tour, length) = (list(self.incumbent), graph.pathlength(self.incumbent))
+        if n <= 3:
+            self.rootBound = self.lowerBound = length
+            self.elapsed = timeit.default_timer() - start
+            return (tour, length, 0.0)
+
+        matrix = np.asarray(graph.denseMatrix(), dtype=np.float64)
+        (self.rootBound, penalties) = heldKarpPenalties(graph, self.iterations, upper=length)
+        integral = integralWeights(graph)
+        if integral:
+            self.rootBound = math.ceil(self.rootBound - 1e-6)
+        weights = matrix + penalties[:, None] + penalties[None, :]
+        offset = 2 * penalties.sum()
+        best, bestLength = graph.tourIds(tour), length
+        everyone = np.arange(n)
+
+        # Stack of (bound, path of vertex ids, penalized path weight), explored last in first out
+        stack = [(self.rootBound, [0], 0.0)]
+        stopped = False
+        while stack:
+            if (self.nodeLimit is not None and self.nodes >= self.nodeLimit) or \
+               (self.timeLimit is not None and self.nodes % 64 == 0 and timeit.default_timer() - start >= self.timeLimit):
+                stopped = True
+                break
+            (bound, path, cost) = stack.pop()
+            if bound >= bestLength - 1e-9:
+                self.pruned += 1
+                continue
+            self.nodes += 1
+            last = path[-1]
+            visited = np.zeros(n, dtype=bool)
+            visited[path] = True
+            unvisited = everyone[~visited]
+
+            if len(unvisited) == 1: # only one way to finish
+                ids = np.array(path + [int(unvisited[0])])
+                total = graph.pairWeights(ids, np.roll(ids, -1)).sum().item()
+                if total < bestLength - 1e-9:
+                    best, bestLength = ids, total
+                    self.improvements += 1
+                continue
+
+            self.trees += 1
+            tree = _treeWeight(weights, np.append(unvisited, 0))
+            bounds = cost + weights[last, unvisited] + tree - offset
+            if integral:
+                bounds = np.ceil(bounds - 1e-6)
+            order = np.argsort(matrix[last, unvisited], kind='stable')[::-1] # farthest pushed first, nearest popped first
+            for c in order.tolist():
+                if bounds[c] >= bestLength - 1e-9:
+                    self.pruned += 1
+                    continue
+                j = int(unvisited[c])
+                stack.append((max(bound, bounds[c]), path + [j], cost + weights[last, j]))
+
+        self.elapsed = timeit.default_timer() - start
+        if stopped:
+            self.lowerBound = min(bestLength, max(self.rootBound, min(entry[0] for entry in stack)))
+        else:
+            self.lowerBound = bestLength
+        tour = graph.tourVertices(np.asarray(best, dtype=np.intp))
+        return (tour, bestLength, optimalityGap(bestLength, self.lowerBound))
+
+    """
+    @return: dictionary of the search counters
+    """
+    def counters(self):
+        return {'nodes': self.nodes, 'pruned': self.pruned, 'trees': self.trees,
+                'improvements': self.improvements, 'elapsed': self.elapsed,
+                'nodesPerSecond': self.nodes / self.elapsed if self.elapsed > 0 else 0.0,
+                'rootBound': self.rootBound, 'lowerBound': self.lowerBound}
+
+
+# Branch and bound; see BranchAndBound
+# @param graph: a weighted graph
+# @param options: passed on to BranchAndBound
+# @return: (best tour found, its length, certified gap: 0 if proven optimal)
+def branchAndBound(graph, **options):
+    return BranchAndBound(graph, **options).solve()
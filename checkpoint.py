@@ -0,0 +1,91 @@
+# Authors: Josiah Bartlett and Tom Joyce
+# Purpose: periodic, atomic checkpoints of anneal and evolve runs, so a preempted run resumes where it stopped
+
+import os
+import pickle
+import timeit
+import numpy as np
+
+# Version of the checkpoint layout; files of another version are refused
+VERSION = 1
+
+
+class Checkpoint(object):
+
+    """
+    @param path: file the run's state is written to
+    @param interval: least seconds between writes (None to write by iterations only)
+    @param every: iterations (temperatures or generations) between writes (None to write by time only)
+    Pass the same Checkpoint to evolve or anneal again after a preemption and the run
+    continues from the last state written, bit for bit as if it had never stopped; delete
+    the file (remove) to start afresh. Between writes a run pays one clock read per
+    iteration. A write goes to path.tmp, is flushed to disk and then renamed over path,
+    so a crash in the middle of one leaves the previous checkpoint intact.
+    """
+    def __init__(self, path, interval=60.0, every=None):
+        self.path = path
+        self.interval = interval
+        self.every = every
+        self.lastSaved = timeit.default_timer()
+        self.writes = 0
+        self.writeTime = 0.0 # seconds spent writing
+
+    """
+    @param iteration: the run's iterations completed so far
+    @return: True if the state should be written now
+    """
+    def due(self, iteration):
+        if self.every is not None and iteration % self.every == 0:
+            return True
+        return self.interval is not None and timeit.default_timer() - self.lastSaved >= self.interval
+
+    """
+    @param state: dictionary of the run's state (numpy arrays, numbers, lists, RNG states)
+    """
+    def save(self, state):
+        start = timeit.default_timer()
+        state = dict(state, version=VERSION)
+        temporary = self.path + '.tmp'
+        with open(temporary, 'wb') as f:
+            pickle.dump(state, f, pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, self.path)
+        self.lastSaved = timeit.default_timer()
+        self.writes += 1
+        self.writeTime += self.lastSaved - start
+
+    """
+    @param solver: 'anneal' or 'evolve', the solver about to resume
+    @param settings: dictionary of that run's settings, which must match the saved ones
+    @return: the saved state, or None if there is no checkpoint yet
+    """
+    def load(self, solver, settings):
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, 'rb') as f:
+            state = pickle.load(f)
+        if state.get('version') != VERSION:
+            raise ValueError("%s is a checkpoint of version %s, not %d" % (self.path, state.get('version'), VERSION))
+        if state['solver'] != solver or state['settings'] != settings:
+            raise ValueError("%s holds a checkpoint of another run: %s %s"
+                             % (self.path, state['solver'], state['settings']))
+        return state
+
+    """
+    Deletes the checkpoint file, if any
+    """
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+# @param tours: array of vertex ids
+# @return: the same ids in the smallest integer type that holds them, to keep checkpoints compact
+def packTours(tours):
+    return tours.astype(np.int16) if tours.size == 0 or tours.max() < 2 ** 15 else tours
+
+# @param packed: array written by packTours
+# @return: the ids as int32 again
+def unpackTours(packed):
+    return packed.astype(np.int32)
@@ -0,0 +1,174 @@
+# Authors: Josiah Bartlett and Tom Joyce
+# Purpose: fast tour construction heuristics to seed the metaheuristics
+
+import numpy as np
+from localsearch import nearestNeighborLists
+
+
+# @param graph: a weighted graph
+# @param tour: array of vertex ids
+# @return: length of the closed tour
+def _tourLength(graph, tour):
+    if len(tour) < 2:
+        return 0
+    length = graph.pairWeights(tour, np.roll(tour, -1)).sum().item()
+    if length == float('inf'):
+        raise ValueError("no edge closes the tour from %s back to %s" % tuple(graph.tourVertices(tour[[-1, 0]])))
+    return length
+
+# @param graph: a weighted graph
+# @param start: id of the start vertex
+# @return: array of vertex ids, always moving to the closest unvisited vertex
+def nearestNeighborIds(graph, start):
+    n = len(graph.vertices())
+    tour = np.empty(n, dtype=np.intp)
+    visited = np.zeros(n, dtype=bool)
+    row = np.empty(n, dtype=np.float64)
+    v = start
+    for k in range(n):
+        tour[k] = v
+        visited[v] = True
+        if k == n - 1:
+            break
+        row[:] = graph.distanceBlock(v)
+        row[visited] = np.inf
+        v = int(np.argmin(row))
+        if row[v] == np.inf:
+            raise ValueError("no unvisited vertex is adjacent to %s" % graph.tourVertices(tour[k:k + 1])[0])
+    return tour
+
+# Nearest-neighbor construction: O(n^2) with a visited mask and a vectorized argmin per step
+# @param graph: a weighted graph
+# @param v: start vertex
+# @return: (tour list starting at v, tour length)
+def nearestNeighborTour(graph, v):
+    tour = nearestNeighborIds(graph, graph.tourIds([v])[0])
+    return (graph.tourVertices(tour), _tourLength(graph, tour))
+
+# Nearest neighbor from many start vertices at once; each step advances every start
+# @param graph: a weighted graph
+# @param starts: start vertices (default all of them)
+# @param batch: number of starts advanced together, which bounds memory to batch x n
+# @return: (shortest tour list found, its length)
+def multiStartNearestNeighbor(graph, starts=None, batch=256):
+    n = len(graph.vertices())
+    if starts is None:
+        startIds = np.arange(n)
+    else:
+        startIds = graph.tourIds(list(starts))
+    best, bestLength = None, None
+    for first in range(0, len(startIds), batch):
+        current = startIds[first:first + batch]
+        m = len(current)
+        rows = np.arange(m)
+        tours = np.empty((m, n), dtype=np.intp)
+        visited = np.zeros((m, n), dtype=bool)
+        weights = np.empty((m, n), dtype=np.float64)
+        for k in range(n):
+            tours[:, k] = current
+            visited[rows, current] = True
+            if k == n - 1:
+                break
+            weights[:] = graph.distanceBlock(current)
+            weights[visited] = np.inf
+            current = np.argmin(weights, axis=1)
+            stuck = weights[rows, current] == np.inf
+            if stuck.any(): # drop the starts that got stuck and carry on with the rest
+                keep = ~stuck
+                (tours, visited, current) = (tours[keep], visited[keep], current[keep])
+                m = len(current)
+                rows = np.arange(m)
+                weights = weights[:m]
+                if m == 0:
+                    break
+        if m == 0:
+            continue
+        lengths = graph.pairWeights(tours, np.roll(tours, -1, axis=1)).sum(axis=1) if n > 1 else np.zeros(m)
+        i = int(np.argmin(lengths))
+        if bestLength is None or lengths[i] < bestLength:
+            best, bestLength = tours[i], lengths[i].item()
+    if best is None or bestLength == float('inf'):
+        raise ValueError("nearest neighbor found no tour from any of its starts: the graph is not complete")
+    return (graph.tourVertices(best), bestLength)
+
+# @param parent: union-find parent list
+# @return: representative of v's set, halving the path on the way
+def _find(parent, v):
+    while parent[v] != v:
+        parent[v] = parent[parent[v]]
+        v = parent[v]
+    return v
+
+# Greedy-edge construction: take candidate edges shortest first, skipping any that
+# would give a vertex degree 3 or close a cycle (checked with union-find), then join
+# the resulting path fragments end to end, nearest endpoint first
+# @param graph: a weighted graph
+# @param k: candidate edges per vertex, from its k nearest neighbors
+# @return: (tour list, tour length)
+def greedyEdgeTour(graph, k=10):
+    n = len(graph.vertices())
+    if n < 3:
+        tour = np.arange(n)
+        return (graph.tourVertices(tour), _tourLength(graph, tour))
+
+    neighbors = nearestNeighborLists(graph, k)
+    first = np.repeat(np.arange(n), neighbors.shape[1])
+    second = neighbors.ravel()
+    first, second = np.minimum(first, second), np.maximum(first, second)
+    edges = np.unique(first * n + second)
+    first, second = edges // n, edges % n
+    weights = graph.pairWeights(first, second)
+    order = np.argsort(weights, kind='stable')
+    order = order[np.isfinite(weights[order])]
+
+    degree = [0] * n
+    parent = list(range(n))
+    adjacency = [[] for v in range(n)]
+    for (u, v) in zip(first[order].tolist(), second[order].tolist()):
+        if degree[u] < 2 and degree[v] < 2:
+            ru, rv = _find(parent, u), _find(parent, v)
+            if ru != rv:
+                parent[ru] = rv
+                degree[u] += 1
+                degree[v] += 1
+                adjacency[u].append(v)
+                adjacency[v].append(u)
+
+    # Walk each fragment from one of its ends
+    fragments = []
+    seen = [False] * n
+    for v in range(n):
+        if degree[v] < 2 and not seen[v]:
+            path = [v]
+            seen[v] = True
+            previous, current = None, v
+            while True:
+                step = [u for u in adjacency[current] if u != previous]
+                if not step:
+                    break
+                previous, current = current, step[0]
+                seen[current] = True
+                path.append(current)
+            fragments.append(path)
+
+    # Chain the fragments, each time going to the closest free endpoint
+    tour = list(fragments[0])
+    heads = np.array([f[0] for f in fragments])
+    tails = np.array([f[-1] for f in fragments])
+    free = np.ones(len(fragments), dtype=bool)
+    free[0] = False
+    for i in range(len(fragments) - 1):
+        end = tour[-1]
+        toHead = np.where(free, graph.pairWeights(end, heads), np.inf)
+        toTail = np.where(free, graph.pairWeights(end, tails), np.inf)
+        h, t = int(np.argmin(toHead)), int(np.argmin(toTail))
+        if toHead[h] <= toTail[t]:
+            j, piece = h, fragments[h]
+        else:
+            j, piece = t, fragments[t][::-1]
+        if not np.isfinite(min(toHead[h], toTail[t])):
+            raise ValueError("greedy edge got stuck: the graph is not complete")
+        free[j] = False
+        tour.extend(piece)
+    tour = np.array(tour, dtype=np.intp)
+    return (graph.tourVertices(tour), _tourLength(graph, tour))
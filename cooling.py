@@ -0,0 +1,203 @@
+# Authors: Josiah Bartlett and Tom Joyce
+# Purpose: cooling schedules for simulated annealing, calibrated to the scale of the edge weights
+
+import math
+import numpy as np
+
+
+# @param agent: a SimAnnealingTSPAgent, whose random number generator and move mix are used
+# @param tspgraph: a SimAnnealingTSPGraph with at least 4 vertices
+# @param samples: number of random moves to score
+# @return: array of the positive (uphill) changes in length among the sampled moves
+def sampleUphill(agent, tspgraph, samples=1000):
+    rng = agent.random
+    n = len(tspgraph.pathlist)
+    deltas = []
+    for k in range(samples):
+        (i, j) = rng.sample(range(n), 2)
+        if rng.random() < agent.twoOptRate:
+            delta = tspgraph.reverseDelta(i, j)
+        else:
+            delta = tspgraph.swapDelta(i, j)
+        if delta > 0:
+            deltas.append(delta)
+    return np.array(deltas, dtype=np.float64)
+
+# @param uphill: array of uphill changes in length
+# @param acceptance: wanted mean Metropolis acceptance probability of those moves, in (0, 1)
+# @return: the temperature T with mean(exp(-uphill / T)) = acceptance, found by bisection on log T
+def temperatureFor(uphill, acceptance):
+    if len(uphill) == 0:
+        return 1.0
+    low, high = math.log(uphill.min()) - 20, math.log(uphill.max()) + 20
+    for k in range(60):
+        middle = (low + high) / 2
+        if np.exp(-uphill / math.exp(middle)).mean() < acceptance:
+            low = middle
+        else:
+            high = middle
+    return math.exp((low + high) / 2)
+
+
+class FixedSchedule(object):
+
+    # The original schedule: start at 1.0, multiply by 0.999 per temperature and stop at
+    # 0.001, trying 2 (n // 50 + 1) moves at each temperature whatever the weights are.
+    # A warm start begins at warmTemperature instead, the last third of the schedule.
+    calibrationMoves = 0
+    warmTemperature = 0.01
+
+    def start(self, agent, tspgraph, warm=False):
+        return (self.warmTemperature if warm else 1.0, 2 * (len(tspgraph.pathlist) // 50 + 1))
+
+    def cool(self, temp, accepted, steps, improved):
+        temp *= 0.999
+        return temp if temp > 0.001 else None
+
+
+class CoolingSchedule(object):
+
+    # Base class of the calibrated schedules
+    # @param initial: starting temperature (default: calibrated so that initialAcceptance of uphill moves pass)
+    # @param final: temperature to stop at (default: calibrated the same way from finalAcceptance)
+    # @param initialAcceptance, finalAcceptance: acceptance ratios the default temperatures are calibrated to
+    # @param epochFactor: moves tried at each temperature, per vertex
+    # @param frozen: acceptance ratio below which an epoch counts as stagnant if the best tour did not improve
+    # @param patience: stagnant epochs in a row before reheating, or stopping once out of reheats
+    # @param reheats: number of times to reheat
+    # @param reheatFraction: fraction of the starting temperature to reheat to
+    # @param warmAcceptance: acceptance ratio the starting temperature of a warm start is calibrated to
+    def __init__(self, initial=None, final=None, initialAcceptance=0.05, finalAcceptance=1e-5,
+                 epochFactor=4.0, frozen=0.01, patience=5, reheats=0, reheatFraction=0.3, samples=1000,
+                 warmAcceptance=0.0001):
+        self.initial = initial
+        self.final = final
+        self.initialAcceptance = initialAcceptance
+        self.finalAcceptance = finalAcceptance
+        self.warmAcceptance = warmAcceptance
+        self.epochFactor = epochFactor
+        self.frozen = frozen
+        self.patience = patience
+        self.reheats = reheats
+        self.reheatFraction = reheatFraction
+        self.samples = samples
+
+    # Calibrate for this run and reset the stagnation state
+    # @param warm: the tour is already good; start at the (calibrated) warmAcceptance temperature
+    # @return: (starting temperature, moves per temperature)
+    def start(self, agent, tspgraph, warm=False):
+        n = len(tspgraph.pathlist)
+        uphill = None
+        self.calibrationMoves = 0
+        if self.initial is None or self.final is None or warm:
+            uphill = sampleUphill(agent, tspgraph, self.samples)
+            self.calibrationMoves = self.samples
+        if warm:
+            self.startTemp = temperatureFor(uphill, self.warmAcceptance)
+            if self.initial is not None:
+                self.startTemp = min(self.startTemp, self.initial)
+        else:
+            self.startTemp = self.initial if self.initial is not None else temperatureFor(uphill, self.initialAcceptance)
+        self.finalTemp = self.final if self.final is not None else temperatureFor(uphill, self.finalAcceptance)
+        self.finalTemp = min(self.finalTemp, self.startTemp)
+        self.stagnant = 0
+        self.reheatsLeft = self.reheats
+        self.epochs = 0
+        self.prepare()
+        return (self.startTemp, max(1, int(self.epochFactor * n)))
+
+    # Hook for subclasses to derive their parameters once the temperatures are known
+    def prepare(self):
+        pass
+
+    # @param temp: the temperature of the epoch just finished
+    # @param accepted: moves accepted in that epoch
+    # @param steps: moves tried in that epoch
+    # @param improved: whether the best tour so far got shorter in that epoch
+    # @return: the next temperature, or None to stop
+    def cool(self, temp, accepted, steps, improved):
+        self.epochs += 1
+        if improved or float(accepted) / steps >= self.frozen:
+            self.stagnant = 0
+        else:
+            self.stagnant += 1
+        if self.stagnant >= self.patience:
+            if self.reheatsLeft == 0:
+                return None
+            self.reheatsLeft -= 1
+            self.stagnant = 0
+            return self.reheatFraction * self.startTemp
+        temp = self.next(temp, float(accepted) / steps)
+        return temp if temp > self.finalTemp else None
+
+    # @param temp: the current temperature
+    # @param ratio: acceptance ratio of the epoch just finished
+    # @return: the next temperature
+    def next(self, temp, ratio):
+        raise NotImplementedError
+
+
+class GeometricSchedule(CoolingSchedule):
+
+    # T <- alpha T after each epoch
+    # @param alpha: cooling factor
+    def __init__(self, alpha=0.95, **options):
+        CoolingSchedule.__init__(self, **options)
+        self.alpha = alpha
+
+    def next(self, temp, ratio):
+        return self.alpha * temp
+
+
+class LundyMeesSchedule(CoolingSchedule):
+
+    # T <- T / (1 + beta T), with beta chosen so the starting temperature
+    # falls to the final one in the given number of epochs
+    # @param epochs: number of temperatures from start to finish
+    def __init__(self, epochs=100, **options):
+        CoolingSchedule.__init__(self, **options)
+        self.epochCount = epochs
+
+    def prepare(self):
+        self.beta = (self.startTemp - self.finalTemp) / (max(self.epochCount, 1) * self.startTemp * self.finalTemp)
+
+    def next(self, temp, ratio):
+        return temp / (1 + self.beta * temp)
+
+
+class AdaptiveSchedule(CoolingSchedule):
+
+    # Geometric cooling whose factor follows the acceptance ratio: fast while the
+    # tour is still close to random (ratio above high) or nearly frozen (below low),
+    # slow in between, where most of the tour's structure is settled
+    # @param fast, slow: cooling factors
+    # @param high, low: acceptance ratios bounding the slow band
+    def __init__(self, fast=0.9, slow=0.97, high=0.03, low=0.002, **options):
+        CoolingSchedule.__init__(self, **options)
+        self.fast = fast
+        self.slow = slow
+        self.high = high
+        self.low = low
+
+    def next(self, temp, ratio):
+        return temp * (self.slow if self.low <= ratio <= self.high else self.fast)
+
+
+# Cooling schedules by name
+schedules = {
+    'fixed': FixedSchedule,
+    'geometric': GeometricSchedule,
+    'lundymees': LundyMeesSchedule,
+    'adaptive': AdaptiveSchedule,
+}
+
+# @param schedule: a schedule object, the name of one in schedules, or None for the fixed schedule
+# @return: a schedule object
+def coolingSchedule(schedule=None):
+    if schedule is None:
+        return FixedSchedule()
+    if isinstance(schedule, str):
+        if schedule not in schedules:
+            raise ValueError("unknown cooling schedule: %s" % schedule)
+        return schedules[schedule]()
+    return schedule
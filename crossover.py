@@ -0,0 +1,178 @@
+# Authors: Josiah Bartlett and Tom Joyce
+# Purpose: order-preserving crossover operators for permutation tours
+
+import numpy as np
+
+# Every operator works on tours given as numpy arrays of vertex ids 0..n-1.
+# The batched forms take two (m x n) arrays of parents, one pair per row,
+# and write m children into out (allocated if not given).
+# The single forms cross one pair of parents and return one child.
+# All run in O(n) per child, using boolean "taken" masks and position indices.
+
+
+# @param parents1, parents2: (m x n) arrays of parent tours
+# @return: an (m x n) output buffer, out itself if given
+def _output(parents1, out):
+    if out is None:
+        out = np.empty_like(parents1)
+    return out
+
+# Keep parents1[a:b] in place and fill the other positions with the
+# missing vertices in the order they appear in parents2
+# @param a, b: arrays of segment bounds, one pair per row
+# @param rotate: if True, start filling (and reading parents2) after the segment, as in OX
+def _keepSegment(parents1, parents2, a, b, rotate, out):
+    m, n = parents1.shape
+    rows = np.arange(m)[:, None]
+    cols = np.arange(n)[None, :]
+    inSegment = (cols >= a[:, None]) & (cols < b[:, None])
+    taken = np.zeros((m, n), dtype=bool)
+    taken[rows, parents1] = inSegment
+    if rotate:
+        order = (cols + b[:, None]) % n
+    else:
+        order = np.broadcast_to(cols, (m, n))
+    donors = parents2[rows, order]
+    free = ~np.take_along_axis(inSegment, order, axis=1)
+    out[inSegment] = parents1[inSegment]
+    out[rows.repeat(n, axis=1)[free], order[free]] = donors[~taken[rows, donors]]
+    return out
+
+# @return: two arrays of cut points 0 <= a < b <= n, one pair per row
+def _cuts(m, n, rng):
+    a = rng.integers(0, n, size=m)
+    b = rng.integers(0, n, size=m)
+    a, b = np.minimum(a, b), np.maximum(a, b) + 1
+    return a, b
+
+
+# The original half-split crossover: keep one half of a random parent,
+# fill the rest in the other parent's order
+def halfBatch(parents1, parents2, rng, out=None):
+    out = _output(parents1, out)
+    m, n = parents1.shape
+    flip = rng.random(m) < 0.5
+    first = np.where(flip[:, None], parents2, parents1)
+    second = np.where(flip[:, None], parents1, parents2)
+    keepFirstHalf = rng.random(m) < 0.5
+    a = np.where(keepFirstHalf, 0, n // 2)
+    b = np.where(keepFirstHalf, n // 2, n)
+    return _keepSegment(first, second, a, b, False, out)
+
+# Order crossover (OX): copy a random segment of parents1, then fill the
+# remaining positions, starting after the segment, with the missing vertices
+# in parents2's order starting after the segment
+def oxBatch(parents1, parents2, rng, out=None):
+    out = _output(parents1, out)
+    m, n = parents1.shape
+    a, b = _cuts(m, n, rng)
+    return _keepSegment(parents1, parents2, a, b, True, out)
+
+# Partially mapped crossover (PMX): copy a random segment of parents1, take
+# every other position from parents2, and resolve duplicates by following
+# the segment's mapping until a vertex outside the segment is reached
+def pmxBatch(parents1, parents2, rng, out=None):
+    out = _output(parents1, out)
+    m, n = parents1.shape
+    a, b = _cuts(m, n, rng)
+    rows = np.arange(m)[:, None]
+    cols = np.arange(n)[None, :]
+    inSegment = (cols >= a[:, None]) & (cols < b[:, None])
+    position1 = np.empty_like(parents1)
+    position1[rows, parents1] = cols
+    taken = np.zeros((m, n), dtype=bool)
+    taken[rows, parents1] = inSegment
+    np.copyto(out, np.where(inSegment, parents1, parents2))
+    r, c = np.nonzero(~inSegment & taken[rows, parents2])
+    v = parents2[r, c]
+    clash = np.ones(len(v), dtype=bool)
+    while clash.any():
+        v[clash] = parents2[r[clash], position1[r[clash], v[clash]]]
+        clash = taken[r, v]
+    out[r, c] = v
+    return out
+
+# Edge recombination crossover (ERX): build the union of both parents'
+# adjacencies and walk it, always moving to the unvisited neighbor with the
+# fewest unvisited neighbors of its own, jumping to a random unvisited vertex
+# when the walk is stuck
+def erxBatch(parents1, parents2, rng, out=None):
+    out = _output(parents1, out)
+    for i in range(len(parents1)):
+        out[i] = erx(parents1[i], parents2[i], rng)
+    return out
+
+
+def half(parent1, parent2, rng):
+    return halfBatch(parent1[None, :], parent2[None, :], rng)[0]
+
+def ox(parent1, parent2, rng):
+    return oxBatch(parent1[None, :], parent2[None, :], rng)[0]
+
+def pmx(parent1, parent2, rng):
+    return pmxBatch(parent1[None, :], parent2[None, :], rng)[0]
+
+def erx(parent1, parent2, rng):
+    n = len(parent1)
+    adjacency = [[] for v in range(n)]
+    for parent in (parent1.tolist(), parent2.tolist()):
+        for i in range(n):
+            v = parent[i]
+            for u in (parent[i-1], parent[(i+1) % n]):
+                if u != v and u not in adjacency[v]:
+                    adjacency[v].append(u)
+    visited = [False] * n
+    fallback = rng.permutation(n).tolist()
+    nextFallback = 0
+    child = np.empty(n, dtype=parent1.dtype)
+    v = int(parent1[0])
+    for k in range(n):
+        child[k] = v
+        visited[v] = True
+        best = -1
+        bestCount = n
+        for u in adjacency[v]:
+            if not visited[u]:
+                count = 0
+                for w in adjacency[u]:
+                    if not visited[w]:
+                        count += 1
+                if count < bestCount:
+                    best, bestCount = u, count
+        if best < 0:
+            while nextFallback < n and visited[fallback[nextFallback]]:
+                nextFallback += 1
+            if nextFallback == n:
+                break
+            best = fallback[nextFallback]
+        v = best
+    return child
+
+
+operators = {'half': halfBatch, 'ox': oxBatch, 'pmx': pmxBatch, 'erx': erxBatch}
+
+# @param name: 'half', 'ox', 'pmx' or 'erx'
+# @return: the batched crossover operator with that name
+def crossoverBatch(name):
+    if name not in operators:
+        raise ValueError("unknown crossover operator: %s" % name)
+    return operators[name]
+
+
+# Test function for the crossover operators
+def test():
+    rng = np.random.default_rng(1)
+    for n in (1, 2, 3, 10, 101):
+        parents1 = np.array([rng.permutation(n) for i in range(50)], dtype=np.int32)
+        parents2 = np.array([rng.permutation(n) for i in range(50)], dtype=np.int32)
+        for name in sorted(operators):
+            children = crossoverBatch(name)(parents1, parents2, rng)
+            valid = all(sorted(child) == list(range(n)) for child in children.tolist())
+            print(name, "children of", n, "vertices are permutations:", valid)
+            assert valid
+            single = {'half': half, 'ox': ox, 'pmx': pmx, 'erx': erx}[name](parents1[0], parents2[0], rng)
+            assert sorted(single.tolist()) == list(range(n))
+
+
+if __name__ == '__main__':
+    test()
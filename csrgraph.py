@@ -0,0 +1,252 @@
+# Authors: Josiah Bartlett and Tom Joyce
+# Purpose: compressed sparse row graphs over integer vertex ids, with iterative traversals for large sparse networks
+
+from collections import OrderedDict
+from heapq import heappush, heappop
+import numpy as np
+
+
+class CSRGraph(object):
+
+    """
+    @param indptr: array of n + 1 offsets; the neighbors of vertex id i are indices[indptr[i]:indptr[i+1]]
+    @param indices: array of neighbor ids, grouped by vertex
+    @param weights: optional array of edge weights, parallel to indices
+    @param vertexOrder: optional list of the vertex with each id (default: the ids themselves)
+    """
+    def __init__(self, indptr, indices, weights=None, vertexOrder=None):
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int32 if len(self.indptr) <= 2 ** 31 else np.int64)
+        self.weights = None if weights is None else np.asarray(weights)
+        self.vertexOrder = vertexOrder
+        self.n = len(self.indptr) - 1
+
+    """
+    @param n: number of vertices
+    @param first, second: arrays of the vertex ids at the two ends of each edge
+    @param weights: optional array of edge weights
+    @param symmetric: if True each edge is stored in both directions
+    @param vertexOrder: optional list of the vertex with each id
+    @return: a CSRGraph of those edges, built with one stable sort
+    """
+    @classmethod
+    def fromEdges(cls, n, first, second, weights=None, symmetric=True, vertexOrder=None):
+        first = np.asarray(first, dtype=np.int64)
+        second = np.asarray(second, dtype=np.int64)
+        if symmetric:
+            first, second = np.concatenate([first, second]), np.concatenate([second, first])
+            if weights is not None:
+                weights = np.concatenate([weights, weights])
+        order = np.argsort(first, kind='stable')
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(first, minlength=n), out=indptr[1:])
+        return cls(indptr, second[order], None if weights is None else np.asarray(weights)[order], vertexOrder)
+
+    """
+    @return: number of stored (directed) edges
+    """
+    def edgeCount(self):
+        return len(self.indices)
+
+    """
+    @param i: vertex id
+    @return: array of the ids adjacent to i
+    """
+    def neighborIds(self, i):
+        return self.indices[self.indptr[i]:self.indptr[i + 1]]
+
+    """
+    @param ids: vertex ids
+    @return: the vertices with those ids
+    """
+    def verticesOf(self, ids):
+        if self.vertexOrder is None:
+            return list(ids)
+        return [self.vertexOrder[i] for i in ids]
+
+    """
+    @param frontier: array of vertex ids
+    @return: (neighbor ids of every vertex in frontier, the frontier vertex each came from)
+    """
+    def __expand(self, frontier):
+        starts = self.indptr[frontier]
+        counts = self.indptr[frontier + 1] - starts
+        total = int(counts.sum())
+        if total == 0:
+            return (np.empty(0, dtype=self.indices.dtype), np.empty(0, dtype=frontier.dtype))
+        offsets = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(total)
+        return (self.indices[offsets], np.repeat(frontier, counts))
+
+    """ Breadth-first search, one vectorized step per level
+    @param source: vertex id
+    @param parent: optional array to fill (and to treat entries >= 0 as already visited)
+    @return: (ids in the order reached, parent array: -1 if unreached, source for the source)
+    """
+    def bfs(self, source, parent=None):
+        if parent is None:
+            parent = np.full(self.n, -1, dtype=np.int64)
+        parent[source] = source
+        frontier = np.array([source], dtype=np.int64)
+        levels = [frontier]
+        while len(frontier):
+            (reached, came) = self.__expand(frontier)
+            fresh = parent[reached] < 0
+            reached, came = reached[fresh], came[fresh]
+            (reached, first) = np.unique(reached, return_index=True)
+            parent[reached] = came[first]
+            frontier = reached.astype(np.int64)
+            levels.append(frontier)
+        return (np.concatenate(levels), parent)
+
+    """ Depth-first search with an explicit stack, so path-like graphs cannot overflow the call stack
+    @param source: vertex id
+    @return: list of the ids reached, in preorder
+    """
+    def dfs(self, source):
+        indptr = self.indptr.tolist()
+        indices = self.indices.tolist()
+        marked = [False] * self.n
+        marked[source] = True
+        order = [source]
+        stack = [source]
+        position = indptr[:] # next edge to look at for each vertex
+        while stack:
+            v = stack[-1]
+            end = indptr[v + 1]
+            k = position[v]
+            while k < end and marked[indices[k]]:
+                k += 1
+            position[v] = k + 1
+            if k == end:
+                stack.pop()
+                continue
+            u = indices[k]
+            marked[u] = True
+            order.append(u)
+            stack.append(u)
+        return order
+
+    """ Components by vectorized hooking and pointer jumping: every vertex points toward the
+    smallest id it is known to be connected to, each edge pulls the two roots it joins
+    to the smaller one, and pointers are then shortcut to their roots. The number of
+    rounds grows with the log of the component size, not its diameter.
+    @return: (number of components, array labeling each id with its component, numbered by smallest id)
+    """
+    def components(self):
+        first = np.repeat(np.arange(self.n, dtype=np.int64), np.diff(self.indptr))
+        second = self.indices.astype(np.int64)
+        labels = np.arange(self.n, dtype=np.int64)
+        while True:
+            a, b = labels[first], labels[second]
+            differ = a != b
+            if not differ.any():
+                break
+            a, b = a[differ], b[differ]
+            np.minimum.at(labels, np.maximum(a, b), np.minimum(a, b))
+            while True:
+                jumped = labels[labels]
+                if (jumped == labels).all():
+                    break
+                labels = jumped
+        (roots, labels) = np.unique(labels, return_inverse=True)
+        return (len(roots), labels.reshape(-1))
+
+    """ Dijkstra's algorithm with a binary heap over the flat arrays
+    @param source: vertex id
+    @param target: optional vertex id to stop at once it is settled
+    @return: (distance array, inf if unreached; parent array, -1 if unreached, source for the source)
+    """
+    def dijkstra(self, source, target=None):
+        if self.weights is None:
+            raise ValueError("Dijkstra needs edge weights")
+        indptr = self.indptr.tolist()
+        indices = self.indices.tolist()
+        weights = self.weights.tolist()
+        distance = [float('inf')] * self.n
+        parent = [-1] * self.n
+        settled = [False] * self.n
+        distance[source] = 0
+        parent[source] = source
+        frontier = [(0, source)]
+        while frontier:
+            (d, v) = heappop(frontier)
+            if settled[v]:
+                continue
+            settled[v] = True
+            if v == target:
+                break
+            for k in range(indptr[v], indptr[v + 1]):
+                u = indices[k]
+                du = d + weights[k]
+                if du < distance[u]:
+                    distance[u] = du
+                    parent[u] = v
+                    heappush(frontier, (du, u))
+        return (np.array(distance, dtype=np.float64), np.array(parent, dtype=np.int64))
+
+    """
+    @param parent: parent array from bfs or dijkstra
+    @param target: vertex id
+    @return: list of ids on the path from the search's source to target (empty if unreached)
+    """
+    def path(self, parent, target):
+        if parent[target] < 0:
+            return []
+        path = [int(target)]
+        while parent[path[-1]] != path[-1]:
+            path.append(int(parent[path[-1]]))
+        path.reverse()
+        return path
+
+
+class ShortestPathCache(object):
+
+    """
+    @param csr: a CSRGraph with edge weights
+    @param capacity: most sources whose results are kept; the least recently used are dropped first
+    Keeps the (distance, parent) arrays of recent single-source Dijkstra runs, so repeated
+    path queries from the same sources do not search again. The cache knows nothing about
+    edits to the graph: call invalidate after changing any edge.
+    """
+    def __init__(self, csr, capacity=128):
+        self.csr = csr
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    """
+    @param source: vertex id
+    @return: (distance array, parent array) of Dijkstra from source, as from CSRGraph.dijkstra
+    """
+    def get(self, source):
+        if source in self.entries:
+            self.hits += 1
+            self.entries.move_to_end(source)
+            return self.entries[source]
+        self.misses += 1
+        result = self.csr.dijkstra(source)
+        self.put(source, result)
+        return result
+
+    """
+    @param source: vertex id
+    @param result: (distance array, parent array) computed elsewhere, e.g. by a metric closure
+    """
+    def put(self, source, result):
+        self.entries[source] = result
+        self.entries.move_to_end(source)
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+
+    """
+    @param source: vertex id to forget (default: every source)
+    """
+    def invalidate(self, source=None):
+        if source is None:
+            self.entries.clear()
+        else:
+            self.entries.pop(source, None)
+
+    def __len__(self):
+        return len(self.entries)
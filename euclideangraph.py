@@ -0,0 +1,117 @@
+# Authors: Josiah Bartlett and Tom Joyce
+# Purpose: a complete graph of points in the plane with lazily computed Euclidean weights
+
+import math
+import numpy as np
+from weightedgraph import WeightedGraph
+from spatialindex import GridIndex
+
+class EuclideanGraph(WeightedGraph):
+
+    """
+    @param coordinates: (n x 2) array; row i holds the position of vertex i
+    @param cacheLimit: largest n for which the dense distance matrix may be built and cached
+    Only the points are stored; weights are computed on demand or a block of rows at a time.
+    """
+    def __init__(self, coordinates, cacheLimit=2000):
+        self.coordinates = np.ascontiguousarray(coordinates, dtype=np.float64)
+        self.cacheLimit = cacheLimit
+        self.adjacencyMap = None
+        self.distanceMatrix = None
+        n = len(self.coordinates)
+        self.vertexOrder = list(range(n))
+        self.vertexIds = {v:v for v in self.vertexOrder}
+        self.identityIds = True
+
+    """
+    @param n: number of points
+    @param low, high: bounds of the square the points lie in
+    @param clusters: if positive, the points are spread normally around this many random centers
+    @param seed: seed for the random number generator
+    @return: an EuclideanGraph of random points
+    """
+    @classmethod
+    def randomPoints(cls, n, low=0.0, high=1.0, clusters=0, seed=None, cacheLimit=2000):
+        rng = np.random.default_rng(seed)
+        if clusters > 0:
+            centers = rng.uniform(low, high, size=(clusters, 2))
+            spread = (high - low) / (4.0 * math.sqrt(clusters))
+            points = centers[rng.integers(clusters, size=n)] + rng.normal(0, spread, size=(n, 2))
+            points = np.clip(points, low, high)
+        else:
+            points = rng.uniform(low, high, size=(n, 2))
+        return cls(points, cacheLimit)
+
+    """
+    @return: distanceMatrix[i][j] -> distance between points i and j
+    Only available (and then cached) when n is at most cacheLimit.
+    """
+    def denseMatrix(self):
+        if self.distanceMatrix is None:
+            n = len(self.coordinates)
+            if n > self.cacheLimit:
+                raise ValueError("%d points is over the dense matrix limit of %d" % (n, self.cacheLimit))
+            self.distanceMatrix = self.distanceBlock(np.arange(n))
+        return self.distanceMatrix
+
+    """
+    @param rows: array of vertex ids (or a single id)
+    @return: array whose row k holds the distances from point rows[k] to every point
+    """
+    def distanceBlock(self, rows):
+        if self.distanceMatrix is not None:
+            return self.distanceMatrix[rows]
+        points = self.coordinates[rows]
+        difference = points[..., None, :] - self.coordinates
+        return np.sqrt(np.einsum('...i,...i->...', difference, difference))
+
+    """
+    @param first, second: broadcastable arrays of vertex ids
+    @return: array of the distances between them
+    """
+    def pairWeights(self, first, second):
+        difference = self.coordinates[first] - self.coordinates[second]
+        return np.sqrt(np.einsum('...i,...i->...', difference, difference))
+
+    """
+    @param k: number of candidates per vertex
+    @return: (n x k) int32 array of the k nearest points to each point, nearest first
+    Found with a uniform grid (see spatialindex.py) instead of scanning all n - 1 others.
+    """
+    def candidateNeighbors(self, k=10):
+        return GridIndex(self.coordinates).kNearest(k)
+
+    """
+    @return: function (i, j) -> distance between points i and j
+    """
+    def idWeights(self):
+        xs = self.coordinates[:, 0].tolist()
+        ys = self.coordinates[:, 1].tolist()
+        hypot = math.hypot
+        return lambda i, j: hypot(xs[i] - xs[j], ys[i] - ys[j])
+
+    """
+    @return: list of vertices adjacent to v (every other point)
+    """
+    def neighborsOf(self, v):
+        return [u for u in self.vertexOrder if u != v]
+
+    """
+    @params v,u: vertices
+    @return: distance between points v and u
+    """
+    def edgeWeight(self, v, u):
+        if v == u:
+            raise KeyError(u)
+        (x1, y1), (x2, y2) = self.coordinates[v], self.coordinates[u]
+        return math.hypot(x1 - x2, y1 - y2)
+
+    """
+    @param pathlist: list of vertices
+    @return: length of the closed tour through pathlist
+    """
+    def pathlength(self, pathlist):
+        if len(pathlist) < 2:
+            return 0
+        tour = np.asarray(pathlist, dtype=np.intp)
+        return self.pairWeights(tour, np.roll(tour, -1)).sum().item()
@@ -0,0 +1,95 @@
+# Authors: Josiah Bartlett and Tom Joyce
+# Purpose: run independent annealing and genetic TSP runs across a pool of processes
+
+import timeit
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from weightedgraph import WeightedGraph
+from simannealing import SimAnnealingTSPGraph, SimAnnealingTSPAgent
+from genetic import evolve
+
+# The outcome of one run: its position in the experiment, the seed it was
+# given, the tour it found, that tour's length and the seconds it took
+RunResult = namedtuple('RunResult', ['index', 'seed', 'length', 'tour', 'elapsed'])
+
+# The graph each worker process solves, set up once by _initWorker
+_workerGraph = None
+
+
+# @param graph: the dense (or coordinate-based) graph to solve
+# Runs once in each worker, so the graph is shipped once per process rather than per task
+def _initWorker(graph):
+    global _workerGraph
+    _workerGraph = graph
+
+# @param task: (solver name, run index, seed, solver options)
+# @return: the RunResult of that run on the worker's graph
+def _runInWorker(task):
+    return runOnce(_workerGraph, task)
+
+# @param graph: a dense weighted graph
+# @param task: (solver name, run index, seed, solver options)
+# @return: the RunResult of that run
+def runOnce(graph, task):
+    (solver, index, seed, options) = task
+    start = timeit.default_timer()
+    if solver == 'anneal':
+        (tour, length) = annealRestarts(graph, seed, **options)
+    elif solver == 'evolve':
+        (best, length) = evolve(graph, seed=seed, **options)
+        tour = best.pathlist
+    else:
+        raise ValueError("unknown solver: %s" % solver)
+    return RunResult(index, seed, length, tour, timeit.default_timer() - start)
+
+# Anneal several times from fresh shuffles and keep the shortest tour
+# @param graph: a weighted graph
+# @param seed: seed for the annealing agent
+# @param restarts: number of annealing sessions
+# @param schedule: cooling schedule for the agent (see the cooling module)
+# @return: (shortest tour, its length)
+def annealRestarts(graph, seed, restarts=10, schedule=None):
+    agent = SimAnnealingTSPAgent(seed=seed, schedule=schedule)
+    tspgraph = SimAnnealingTSPGraph(graph)
+    best = None
+    for i in range(restarts):
+        agent.anneal(tspgraph)
+        if best is None or tspgraph.length < best.length:
+            best = tspgraph.copy()
+    return (best.pathlist, best.length)
+
+# @param seed: master seed (None for fresh entropy)
+# @param count: number of runs
+# @return: one independent, reproducible integer seed per run
+def runSeeds(seed, count):
+    children = np.random.SeedSequence(seed).spawn(count)
+    return [int(child.generate_state(1, np.uint64)[0]) for child in children]
+
+# Run a solver many times, in parallel when workers > 1
+# @param graph: a weighted graph
+# @param solver: 'anneal' or 'evolve'
+# @param runs: number of independent runs
+# @param seed: master seed from which every run's seed is derived
+# @param workers: number of worker processes (None for one per core, 1 for serial)
+# @param options: keyword arguments for the solver (e.g. target_score for evolve)
+# @return: list of RunResults ordered by run index
+# The same seed gives the same results whatever the number of workers
+def runExperiment(graph, solver, runs, seed=None, workers=None, **options):
+    if graph.adjacencyMap is not None:
+        graph = WeightedGraph.fromMatrix(graph.denseMatrix(), graph.vertexOrder)
+    tasks = [(solver, i, s, options) for (i, s) in enumerate(runSeeds(seed, runs))]
+    if workers == 1:
+        return [runOnce(graph, task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_initWorker,
+                             initargs=(graph,)) as pool:
+        return list(pool.map(_runInWorker, tasks))
+
+# @param results: list of RunResults
+# @return: dictionary of basic statistics of the tour lengths and times
+def summarize(results):
+    lengths = [r.length for r in results]
+    times = [r.elapsed for r in results]
+    return {'runs': len(results),
+            'best': min(lengths), 'mean': float(sum(lengths))/len(lengths), 'worst': max(lengths),
+            'fastest': min(times), 'meantime': float(sum(times))/len(times), 'slowest': max(times)}
@@ -2,14 +2,23 @@
 # Purpose: evolving weighted graphs to solve TSP
 
 import random
+import timeit
+import numpy as np
+from crossover import crossoverBatch
+from localsearch import nearestNeighborLists, optimizeIds
+from instrumentation import RunStats
+from checkpoint import packTours, unpackTours
 
 class GeneticTSPGraph(object):
 
     # @param graph: a weighted graph with a randomly shuffled pathlist
-    def __init__(self, graph):
+    # @param pathlist: an existing tour to use instead of a random one
+    def __init__(self, graph, pathlist=None):
         self.graph = graph
-        self.pathlist = graph.vertices()
-        random.shuffle(self.pathlist)
+        if pathlist is None:
+            pathlist = graph.vertices()
+            random.shuffle(pathlist)
+        self.pathlist = pathlist
         self.fit = self.fitness()
 
 
@@ -19,36 +28,16 @@ class GeneticTSPGraph(object):
 
 
     # @param other: another GeneticTSPGraph
+    # @param crossover: name of the operator in the crossover module
+    # @param rng: a numpy random Generator, seeded from the random module if not given
     # @return: a new GeneticTSPGraph generated via crossover
-    def cross(self, other):
-        if random.random() < 0.5:
-            parent1 = self.pathlist
-            parent2 = other.pathlist
-        else:
-            parent1 = other.pathlist
-            parent2 = self.pathlist
-
-        offspring = GeneticTSPGraph(self.graph)
-
-        if random.random() < 0.5:
-            offspring.pathlist[0:len(self.pathlist)/2] = parent1[0:len(self.pathlist)/2]
-
-            count = len(self.pathlist)/2
-            for i in parent2:
-                if i not in parent1[0:len(self.pathlist)/2]:
-                    offspring.pathlist[count] = i
-                    count +=1
-
-        else:
-            offspring.pathlist[len(self.pathlist)/2:] = parent1[len(self.pathlist)/2:]
-
-            count = 0
-            for i in parent2:
-                if i not in parent1[len(self.pathlist)/2:]:
-                    offspring.pathlist[count] = i
-                    count +=1
-
-        return offspring
+    def cross(self, other, crossover='half', rng=None):
+        if rng is None:
+            rng = np.random.default_rng(random.getrandbits(64))
+        parents1 = self.graph.tourIds(self.pathlist)[None, :]
+        parents2 = self.graph.tourIds(other.pathlist)[None, :]
+        child = crossoverBatch(crossover)(parents1, parents2, rng)[0]
+        return GeneticTSPGraph(self.graph, self.graph.tourVertices(child))
 
 
     # Make a small random change to this weighted graph tour
@@ -75,78 +64,198 @@ class GeneticTSPGraph(object):
                 swap = True
         '''
 
-class Population(object):
-
-    # Set up an empty population
-    def __init__(self):
-        self.population = []
-
-    # @param solution: to add to this population
-    def addSolution(self, solution):
-        for i in range(solution.fit):
-            self.population.append(solution)
-
+class TourPopulation(object):
 
-    # @return: a solution chosen randomly in proportion to fitness
-    def select(self):
-        rand = random.randint(0,len(self.population)-1)
-        return self.population[rand]
+    # A whole generation of tours held as rows of one int32 array of vertex ids,
+    # with a preallocated buffer that the next generation is bred into
+    # @param graph: a weighted graph
+    # @param size: number of tours in each generation
+    # @param rng: a numpy random Generator
+    # @param crossover: name of the operator in the crossover module
+    # @param seedTours: optional tours (lists of vertices) to put in place of the first random ones
+    def __init__(self, graph, size, rng, crossover='ox', seedTours=None):
+        self.graph = graph
+        self.crossover = crossoverBatch(crossover)
+        n = len(graph.vertices())
+        self.tours = np.tile(np.arange(n, dtype=np.int32), (size, 1))
+        self.tours = rng.permuted(self.tours, axis=1)
+        for (r, tour) in enumerate((seedTours or [])[:size]):
+            self.tours[r] = graph.tourIds(tour)
+        self.nextTours = np.empty_like(self.tours)
+        self.neighbors = None
+        self.scores = np.empty(size, dtype=np.promote_types(graph.pairWeights(0, 0).dtype, np.int64) if n else np.float64)
+        self.evaluate()
+
+    # Score every tour in the generation with a single gather against the distance matrix
+    def evaluate(self):
+        tours = self.tours
+        if tours.shape[1] < 2:
+            self.scores[:] = 0
+        else:
+            np.sum(self.graph.pairWeights(tours[:, :-1], tours[:, 1:]), axis=1, out=self.scores)
+            self.scores += self.graph.pairWeights(tours[:, -1], tours[:, 0])
+        self.bestIndex = int(np.argmin(self.scores))
 
-    # @return: the current number of solutions
+    # @return: the current number of tours
     def size(self):
-        return len(self.population)
+        return len(self.tours)
 
-    # @return: the highest-fitness solution
+    # @return: the shortest tour, as a list of vertices
     def best(self):
-        bestfitness = self.population[0]
-        for i in range(len(self.population)):
-            if bestfitness.fit >= self.population[i].fit:
-                bestfitness = self.population[i]
-
-        return bestfitness
+        return self.graph.tourVertices(self.tours[self.bestIndex])
 
-    # @return: the fitness of the best solution
+    # @return: the length of the shortest tour
     def score(self):
-        best = self.best()
-        return best.fit
+        return self.scores[self.bestIndex].item()
+
+    # @param count: number of parents to choose
+    # @return: row indices chosen with probability proportional to inverse tour length
+    def roulette(self, count, rng):
+        weights = 1.0 / np.maximum(self.scores, 1e-12)
+        cumulative = np.cumsum(weights)
+        rows = np.searchsorted(cumulative, rng.random(count) * cumulative[-1], side='right')
+        return np.minimum(rows, len(self.tours) - 1)
+
+    # @param count: number of parents to choose
+    # @param k: number of competitors in each tournament
+    # @return: row indices of the shortest of k uniformly chosen tours, count times
+    def tournament(self, count, k, rng):
+        competitors = rng.integers(len(self.tours), size=(count, k))
+        winners = np.argmin(self.scores[competitors], axis=1)
+        return competitors[np.arange(count), winners]
+
+    # Breed the next generation into the spare buffer, swap it in and score it
+    # @param mothers, fathers: row indices of the parents of each child
+    # @param mutation_rate: chance that each pair of neighboring vertices is swapped
+    # @param memetic_rate: chance that each child is improved by local search
+    def breed(self, mothers, fathers, mutation_rate, rng, memetic_rate=0.0):
+        tours, nextTours = self.tours, self.nextTours
+        self.crossover(tours[mothers], tours[fathers], rng, out=nextTours)
+        self.mutate(nextTours, mutation_rate, rng)
+        if memetic_rate > 0:
+            self.improve(nextTours, np.flatnonzero(rng.random(len(nextTours)) < memetic_rate))
+        self.tours, self.nextTours = nextTours, tours
+        self.evaluate()
+
+    # Run 2-opt/Or-opt local search on some tours in place (the memetic step)
+    # @param tours: array of tours
+    # @param rows: indices of the tours to improve
+    def improve(self, tours, rows):
+        if self.neighbors is None:
+            self.neighbors = nearestNeighborLists(self.graph).tolist()
+        weight = self.graph.idWeights()
+        for r in rows.tolist():
+            tours[r] = optimizeIds(tours[r].tolist(), weight, self.neighbors)
+
+    # @param count: number of tours
+    # @return: copies of the count shortest tours, as rows of vertex ids
+    def elite(self, count):
+        count = min(count, len(self.tours))
+        rows = np.argpartition(self.scores, count - 1)[:count] if count else []
+        return self.tours[rows].copy()
+
+    # Replace the longest tours with migrants from another population
+    # @param migrants: rows of vertex ids, as returned by elite
+    def immigrate(self, migrants):
+        count = min(len(migrants), len(self.tours))
+        if count == 0:
+            return
+        worst = np.argpartition(self.scores, len(self.scores) - count)[len(self.scores) - count:]
+        self.tours[worst] = migrants[:count]
+        self.evaluate()
+
+    # Swap neighboring vertices in place, each pair with probability mutation_rate
+    # @param tours: array of tours to mutate
+    def mutate(self, tours, mutation_rate, rng):
+        rows, cols = np.nonzero(rng.random((tours.shape[0], tours.shape[1] - 1)) < mutation_rate)
+        for (r, c) in zip(rows.tolist(), cols.tolist()):
+            tour = tours[r]
+            tour[c], tour[c + 1] = tour[c + 1], tour[c]
 
 # Genetic algorithm
 # @param graph: a weighted graph
 # @param target_score: the tour length that this algorithm is trying to achieve or beat (be less than)
-def evolve(graph, target_score):
-
-    # Parameters
-    population_size = 100
-    mutation_rate = 0.05
-
-    # Initial population
-    population = Population()
-
-    # Fill up the population with GeneticTSPGraph objects
-    while population.size() < population_size:
-        population.addSolution(GeneticTSPGraph(graph))
+# @param selection: how parents are chosen, 'roulette' or 'tournament'
+# @param tournament_size: number of competitors in each tournament
+# @param crossover: crossover operator, 'ox', 'pmx', 'erx' or 'half'
+# @param memetic_rate: chance that each child is improved by 2-opt/Or-opt local search
+# @param max_generations: cutoff point for the number of generations
+# @param seed: seed for the random number generator
+# @param observer: optional instrumentation.Observer, told about each generation; it can stop the run
+# @param seed_tours: optional tours (lists of vertices) to seed the initial population with, e.g. a cached or repaired one
+# @param checkpoint: optional checkpoint.Checkpoint; the run resumes from it if it holds a state,
+# and writes the population, counters and random number generator state to it as it goes
+# @return: (best GeneticTSPGraph, its score); the GeneticTSPGraph also records
+# how many generations ran, how many tours were evaluated and the run's RunStats
+def evolve(graph, target_score, selection='roulette', tournament_size=3,
+           population_size=100, mutation_rate=0.05, crossover='ox', memetic_rate=0.0,
+           max_generations=100000, seed=None, observer=None, seed_tours=None, checkpoint=None):
+
+    if selection not in ('roulette', 'tournament'):
+        raise ValueError("unknown selection strategy: %s" % selection)
+
+    # Initial population of random tours, after any seed tours
+    stats = RunStats('evolve')
+    rng = np.random.default_rng(seed)
+    population = TourPopulation(graph, population_size, rng, crossover, seed_tours)
+    stats.evaluations = population_size
+    stats.offer(population.score())
+    generations = 1
+    if checkpoint is not None:
+        settings = {'vertices': len(graph.vertices()), 'target_score': target_score, 'selection': selection,
+                    'tournament_size': tournament_size, 'population_size': population_size,
+                    'mutation_rate': mutation_rate, 'crossover': crossover, 'memetic_rate': memetic_rate}
+        state = checkpoint.load('evolve', settings)
+        if state is not None:
+            population.tours[...] = unpackTours(state['tours'])
+            population.evaluate()
+            rng.bit_generator.state = state['rng']
+            generations = state['generations']
+            stats.restore(state['stats'])
+    stats.addPhase('initialize', stats.elapsed())
+    if observer is not None:
+        observer.started(stats)
+        observer.improved(stats, population.best())
 
     # Look for an acceptable solution
-    generations = 1
     while population.score() > target_score:
-        nextgen = Population()
 
         # Cutoff point for number of generations
-        if generations > 100000:
+        if generations > max_generations:
             break
 
         # Fill the next generation
-        while nextgen.size() < population_size:
-            mother = population.select()
-            father = population.select()
-            child = mother.cross(father)
-            child.mutate(mutation_rate)
-            nextgen.addSolution(child)
-
-        population = nextgen
+        start = timeit.default_timer()
+        if selection == 'roulette':
+            mothers = population.roulette(population_size, rng)
+            fathers = population.roulette(population_size, rng)
+        else:
+            mothers = population.tournament(population_size, tournament_size, rng)
+            fathers = population.tournament(population_size, tournament_size, rng)
+        middle = timeit.default_timer()
+        population.breed(mothers, fathers, mutation_rate, rng, memetic_rate)
+        stats.addPhase('select', middle - start)
+        stats.addPhase('breed', timeit.default_timer() - middle)
         generations += 1
 
-    return (population.best(), population.score())
+        stats.iterations += 1
+        stats.evaluations += population_size
+        if stats.offer(population.score()) and observer is not None:
+            observer.improved(stats, population.best())
+        if checkpoint is not None and checkpoint.due(stats.iterations):
+            checkpoint.save({'solver': 'evolve', 'settings': settings, 'tours': packTours(population.tours),
+                             'rng': rng.bit_generator.state, 'generations': generations, 'stats': stats.asDict()})
+        if observer is not None and observer.progressed(stats):
+            break
+
+    stats.stop()
+    if observer is not None:
+        observer.finished(stats)
+    best = GeneticTSPGraph(graph, population.best())
+    best.generations = generations
+    best.evaluations = stats.evaluations
+    best.stats = stats
+    return (best, population.score())
 
 """
 if __name__ == '__main__':
@@ -2,6 +2,8 @@
 # Purpose: implement a graph data structure
 
 from collections import deque
+import numpy as np
+from csrgraph import CSRGraph
 
 class Graph(object):
     
@@ -13,14 +15,14 @@ class Graph(object):
     def __init__(self, vertexSet, edgeSet):
         self.adjacencyMap = {v:set() for v in vertexSet}
         for (u,v) in edgeSet:
-            self.adjacencyMap[v].addSolution(u)
-            self.adjacencyMap[u].addSolution(v)
+            self.adjacencyMap[v].add(u)
+            self.adjacencyMap[u].add(v)
     
     """
     @return: list of vertices in this graph
     """
     def vertices(self):
-        return self.adjacencyMap.keys()
+        return list(self.adjacencyMap.keys())
 
     """
     @return: set of vertices adjacent to v
@@ -28,53 +30,44 @@ class Graph(object):
     def neighborsOf(self, v):
         return self.adjacencyMap[v]
     
+    """
+    @return: this graph in compressed sparse row form over vertex ids, built once and cached;
+    vertexOrder[i] is the vertex with id i
+    """
+    def csr(self):
+        if getattr(self, 'csrGraph', None) is None:
+            order = self.vertices()
+            ids = {v:i for (i,v) in enumerate(order)}
+            first, second = [], []
+            for v in order:
+                for u in self.neighborsOf(v):
+                    first.append(ids[v])
+                    second.append(ids[u])
+            self.csrGraph = CSRGraph.fromEdges(len(order), first, second, symmetric=False, vertexOrder=order)
+            self.csrIds = ids
+        return self.csrGraph
+
     """
     @param v: vertex
     @return: set of vertices reachable from v
     """
     def reachableFrom(self, v):
-        markedSet = set()
-        self.__dfs(v, markedSet)
-        return markedSet
+        csr = self.csr()
+        return set(csr.verticesOf(csr.dfs(self.csrIds[v])))
     
     """
     @param v: vertex
     @return: pathMap[u] -> shortest path [v,...,u] as a deque
     """
     def shortestPathsFrom(self, v):
-        parentMap = self.__bfs(v)
+        csr = self.csr()
+        (order, parent) = csr.bfs(self.csrIds[v])
+        parentMap = dict(zip(csr.verticesOf(order), csr.verticesOf(parent[order])))
         return {u:self.__path(u,parentMap) for u in parentMap}
     
     """
     @param v: vertex
-    @param markedSet: set of vertices
-    Adds all vertices reachable from v to markedSet
-    """
-    def __dfs(self, v, markedSet):
-        markedSet.addSolution(v)
-        for u in self.neighborsOf(v):
-            if u not in markedSet:
-                self.__dfs(u, markedSet)
-    
-    """
-    @param v: vertex
-    @return: parentMap[u] -> predecessor of u along shortest path from v
-    """
-    def __bfs(self, v):
-        parentMap = {v:v}
-        frontier = deque()
-        frontier.append(v)
-        while len(frontier) > 0:
-            p = frontier.popleft()
-            for c in self.neighborsOf(p):
-                if c not in parentMap:
-                    parentMap[c] = p
-                    frontier.append(c)
-        return parentMap
-    
-    """
-    @param v: vertex
-    @param parentMap: result of self.__bfs(source)
+    @param parentMap: parentMap[u] -> predecessor of u along a path from the source (the source maps to itself)
     @return: shortest path [v,...,u] as a deque
     """
     def __path(self, v, parentMap):
@@ -85,18 +78,20 @@ class Graph(object):
             path.appendleft(v)
         return path
 
-    """ Components: O(#vertices + #edges)
+    """ Components: O(#vertices + #edges), one traversal over the CSR arrays
     @return: componentMap[v] -> set of vertices reachable from v
     The keys are just the first vertices discovered in each component.
     Unless the graph has no edges, len(componentMap) < len(self.vertices()).
     """
     def components(self):
+        csr = self.csr()
+        (count, labels) = csr.components()
+        order = np.argsort(labels, kind='stable')
+        bounds = np.searchsorted(labels[order], np.arange(count + 1))
         componentMap = {}
-        markedSet = set()
-        for v in self.vertices():
-            if v not in markedSet:
-                componentMap[v] = self.reachableFrom(v)
-                self.__dfs(v, markedSet)
+        for c in range(count):
+            members = csr.verticesOf(order[bounds[c]:bounds[c + 1]])
+            componentMap[members[0]] = set(members)
         return componentMap
 """
 # Test function for the Graph class
@@ -3,22 +3,36 @@
 
 from graph import Graph
 from weightedgraph import WeightedGraph
+from euclideangraph import EuclideanGraph
 import random
 from itertools import combinations
+import numpy as np
 
 class graphGenerator(Graph):
 
-    def __init__(self, n, x, y):
+    def __init__(self, n, x, y, dense=False, euclidean=False, clusters=0, seed=None):
         self.n = n # number of vertices in the graph
-        self.x = x # lower bound for edge weight
-        self.y = y # upper bound for edge weight
+        self.x = x # lower bound for edge weight (or coordinate, if euclidean)
+        self.y = y # upper bound for edge weight (or coordinate, if euclidean)
+        self.dense = dense # store the weighted graph as a dense distance matrix
         self.vertexSet = set()
         for i in range(n):
             self.vertexSet.add(i)
-        self.edgeList = list(combinations(self.vertexSet, 2))
-        self.edgeweightSet = set()
-        for m in self.edgeList:
-            (a,b) = m
-            self.edgeweightSet.add((a, b, random.randrange(self.x, self.y)))
 
-        self.wgraph = WeightedGraph(self.vertexSet, self.edgeweightSet)
\ No newline at end of file
+        if euclidean:
+            # Random points (clustered around a few centers if clusters > 0); only the n x 2 coordinates are stored
+            self.wgraph = EuclideanGraph.randomPoints(n, x, y, clusters, seed)
+        elif dense:
+            # Random weights written straight into a symmetric int32 matrix
+            rng = np.random.default_rng(seed)
+            matrix = np.triu(rng.integers(x, y, size=(n, n), dtype=np.int32), 1)
+            self.wgraph = WeightedGraph.fromMatrix(matrix + matrix.T)
+        else:
+            rng = random if seed is None else random.Random(seed)
+            self.edgeList = list(combinations(self.vertexSet, 2))
+            self.edgeweightSet = set()
+            for m in self.edgeList:
+                (a,b) = m
+                self.edgeweightSet.add((a, b, rng.randrange(self.x, self.y)))
+
+            self.wgraph = WeightedGraph(self.vertexSet, self.edgeweightSet)
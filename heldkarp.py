@@ -0,0 +1,81 @@
+# Authors: Josiah Bartlett and Tom Joyce
+# Purpose: exact TSP for small instances by Held-Karp dynamic programming over subsets
+
+import numpy as np
+
+# Largest DP table, in bytes, that heldKarp builds unless told otherwise
+MEMORY_LIMIT = 2 ** 31
+
+
+# @param matrix: dense distance matrix
+# @return: the numpy dtype for the DP table and the value that stands for "unreachable" in it
+def _tableType(matrix):
+    n = len(matrix)
+    if np.issubdtype(matrix.dtype, np.integer):
+        for dtype in (np.int32, np.int64):
+            sentinel = np.iinfo(dtype).max // 2
+            if int(matrix.max()) * n < sentinel:
+                return (np.dtype(dtype), sentinel)
+    return (np.dtype(np.float64), np.inf)
+
+# @param n: number of vertices
+# @param dtype: dtype of the table
+# @return: bytes taken by the Held-Karp table for n vertices
+def tableBytes(n, dtype=np.int32):
+    m = max(n - 1, 0)
+    return (1 << m) * m * np.dtype(dtype).itemsize
+
+# Held-Karp: cost[S, j] is the length of the shortest path that leaves vertex 0, visits
+# exactly the vertices in bit set S (of vertices 1..n-1) and ends at j in S. The subsets
+# are filled one size at a time; for each size and end vertex j, every subset is relaxed
+# in one vectorized min over its predecessors. O(2^n n^2) time, O(2^n n) memory.
+# @param graph: a weighted graph
+# @param memoryLimit: largest table to build, in bytes
+# @return: (an optimal tour list, its length)
+def heldKarp(graph, memoryLimit=MEMORY_LIMIT):
+    matrix = np.asarray(graph.denseMatrix())
+    n = len(matrix)
+    if n <= 3:
+        tour = np.arange(n)
+        return (graph.tourVertices(tour), graph.pathlength(graph.tourVertices(tour)))
+    (dtype, unreachable) = _tableType(matrix)
+    if tableBytes(n, dtype) > memoryLimit:
+        raise ValueError("Held-Karp on %d vertices needs %d bytes, over the limit of %d"
+                         % (n, tableBytes(n, dtype), memoryLimit))
+
+    m = n - 1
+    weights = np.where(np.isfinite(matrix), matrix, unreachable).astype(dtype)
+    inner = weights[1:, 1:] # inner[i, j]: weight from vertex i+1 to vertex j+1
+    cost = np.full((1 << m, m), unreachable, dtype=dtype)
+    bits = np.arange(m)
+    cost[1 << bits, bits] = weights[0, 1:]
+
+    subsets = np.arange(1 << m)
+    size = np.zeros(1 << m, dtype=np.int8)
+    for b in range(m):
+        size += (subsets >> b) & 1
+    for k in range(2, m + 1):
+        layer = subsets[size == k]
+        for j in range(m):
+            ending = layer[(layer >> j) & 1 == 1]
+            before = cost[ending ^ (1 << j)] + inner[:, j]
+            cost[ending, j] = np.minimum(before.min(axis=1), unreachable)
+    del subsets, size
+
+    full = (1 << m) - 1
+    closing = cost[full] + weights[1:, 0]
+    j = int(np.argmin(closing))
+    length = closing[j]
+    if length >= unreachable:
+        raise ValueError("the graph has no Hamiltonian cycle")
+
+    # Walk back, redoing the same min to find each predecessor
+    tour = [j]
+    subset = full
+    while subset != 1 << j:
+        previous = subset ^ (1 << j)
+        i = int(np.argmin(cost[previous] + inner[:, j]))
+        tour.append(i)
+        subset, j = previous, i
+    tour = np.array([0] + [v + 1 for v in reversed(tour)], dtype=np.intp)
+    return (graph.tourVertices(tour), length.item())
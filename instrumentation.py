@@ -0,0 +1,144 @@
+# Authors: Josiah Bartlett and Tom Joyce
+# Purpose: counters, observer hooks and best-so-far traces for the anneal and evolve loops
+
+import timeit
+from array import array
+import numpy as np
+
+
+class RunStats(object):
+
+    # Counters for one run of a solver, updated once per temperature or generation
+    # @param solver: 'anneal' or 'evolve'
+    def __init__(self, solver):
+        self.solver = solver
+        self.iterations = 0    # temperatures (anneal) or generations (evolve) completed
+        self.evaluations = 0   # tours or moves scored
+        self.acceptances = 0   # moves applied (anneal only)
+        self.improvements = 0  # times the best-so-far length went down
+        self.best = float('inf')
+        self.temperature = None
+        self.phases = {}       # phase name -> seconds spent in it
+        self.started = timeit.default_timer()
+        self.stopped = None
+
+    # @param name: phase name
+    # @param seconds: wall time to add to it
+    def addPhase(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    # @param length: length of the current tour
+    # @return: True if it is a new best-so-far
+    def offer(self, length):
+        if length < self.best:
+            self.best = length
+            self.improvements += 1
+            return True
+        return False
+
+    # Freeze the run's wall time
+    def stop(self):
+        self.stopped = timeit.default_timer()
+
+    # @return: seconds from the start of the run to now, or to its end once stopped
+    def elapsed(self):
+        return (self.stopped or timeit.default_timer()) - self.started
+
+    # @return: fraction of evaluated moves that were applied
+    def acceptanceRate(self):
+        return float(self.acceptances) / self.evaluations if self.evaluations else 0.0
+
+    # @return: JSON-serializable dictionary of the counters
+    def asDict(self):
+        return {'solver': self.solver, 'iterations': self.iterations, 'evaluations': self.evaluations,
+                'acceptances': self.acceptances, 'improvements': self.improvements,
+                'best': self.best, 'phases': dict(self.phases), 'elapsed': self.elapsed()}
+
+    # Take up the counters of an earlier part of the same run (e.g. from a checkpoint)
+    # @param counters: dictionary from asDict
+    def restore(self, counters):
+        for name in ('iterations', 'evaluations', 'acceptances', 'improvements', 'best'):
+            setattr(self, name, counters[name])
+        for (name, seconds) in counters['phases'].items():
+            self.addPhase(name, seconds)
+
+
+class Observer(object):
+
+    # Base class for run observers; every hook does nothing by default.
+    # The solvers only call hooks when an observer is passed in, so an
+    # uninstrumented run pays one "is None" check per temperature or generation.
+    # Stopping is cooperative: progressed returns True and the run ends after that iteration.
+
+    # @param stats: the RunStats of the run, before its first iteration
+    def started(self, stats):
+        pass
+
+    # @param stats: the RunStats of the run, just after stats.best went down
+    # @param tour: the tour of that length, as a list of vertices (copy it to keep it)
+    def improved(self, stats, tour):
+        pass
+
+    # @param stats: the RunStats of the run, after each temperature or generation
+    # @return: True to stop the run early
+    def progressed(self, stats):
+        return False
+
+    # @param stats: the RunStats of the run, once it has stopped
+    def finished(self, stats):
+        pass
+
+
+class TraceRecorder(Observer):
+
+    # Samples (evaluations, seconds, best length) every few iterations into a flat array
+    # @param every: iterations between samples
+    def __init__(self, every=10):
+        self.every = every
+        self.samples = array('d')
+        self.stats = None
+
+    def started(self, stats):
+        self.stats = stats
+        del self.samples[:]
+
+    def progressed(self, stats):
+        if stats.iterations % self.every == 0:
+            self.samples.extend((stats.evaluations, stats.elapsed(), stats.best))
+
+    def finished(self, stats):
+        self.samples.extend((stats.evaluations, stats.elapsed(), stats.best))
+
+    # @return: (m x 3) array of samples: evaluations, seconds, best-so-far length
+    def trace(self):
+        return np.frombuffer(self.samples, dtype=np.float64).reshape(-1, 3).copy()
+
+    # @param path: file to write the trace to, in numpy .npy format
+    def save(self, path):
+        np.save(path, self.trace())
+
+
+class ObserverGroup(Observer):
+
+    # Forwards every hook to each of several observers
+    # @param observers: the observers to notify, in order
+    def __init__(self, *observers):
+        self.observers = observers
+
+    def started(self, stats):
+        for observer in self.observers:
+            observer.started(stats)
+
+    def improved(self, stats, tour):
+        for observer in self.observers:
+            observer.improved(stats, tour)
+
+    def progressed(self, stats):
+        stop = False
+        for observer in self.observers:
+            stop = observer.progressed(stats) or stop
+        return stop
+
+    def finished(self, stats):
+        for observer in self.observers:
+            observer.finished(stats)
@@ -0,0 +1,153 @@
+# Authors: Josiah Bartlett and Tom Joyce
+# Purpose: island-model genetic algorithm, one population per process with periodic migration of the best tours
+
+import multiprocessing
+import os
+from queue import Empty
+import numpy as np
+from sharedgraph import SharedGraph, attachGraph
+from genetic import GeneticTSPGraph, TourPopulation
+from experiments import runSeeds
+
+
+# @param islands: number of islands
+# @param topology: 'ring' (each island sends to the next) or 'full' (each island sends to all others)
+# @return: list whose entry i lists the islands that island i sends migrants to
+def migrationTargets(islands, topology='ring'):
+    if topology == 'ring':
+        return [[(i + 1) % islands] if islands > 1 else [] for i in range(islands)]
+    elif topology == 'full':
+        return [[j for j in range(islands) if j != i] for i in range(islands)]
+    raise ValueError("unknown topology: %s" % topology)
+
+# Evolve one island until it is told to stop, reaches the target or runs out of generations
+# @param graph: the graph rebuilt over shared memory
+# @param index: this island's number
+# @param inbox: queue of migrants sent to this island
+# @param outboxes: queues of the islands this island sends to
+# @param results: queue of ('best', island, score, tour ids, generation) and ('done', island, generations) messages
+# @param stop: event set by the master once any island has reached the target
+# @param seed: seed for this island
+# @param settings: dictionary of the GA and migration settings
+def _runIsland(graph, index, inbox, outboxes, results, stop, seed, settings):
+    rng = np.random.default_rng(seed)
+    size = settings['population_size']
+    population = TourPopulation(graph, size, rng, settings['crossover'])
+    best = float('inf')
+    generations = 0
+    while not stop.is_set() and best > settings['target_score'] and generations < settings['max_generations']:
+        for g in range(settings['migration_interval']):
+            if population.score() < best:
+                best = population.score()
+                results.put(('best', index, best, population.tours[population.bestIndex].copy(), generations))
+                if best <= settings['target_score']:
+                    break
+            if generations >= settings['max_generations']:
+                break
+            if settings['selection'] == 'roulette':
+                mothers = population.roulette(size, rng)
+                fathers = population.roulette(size, rng)
+            else:
+                mothers = population.tournament(size, settings['tournament_size'], rng)
+                fathers = population.tournament(size, settings['tournament_size'], rng)
+            population.breed(mothers, fathers, settings['mutation_rate'], rng, settings['memetic_rate'])
+            generations += 1
+
+        # Send the best tours on and take in whatever has arrived
+        migrants = population.elite(settings['migrants'])
+        for outbox in outboxes:
+            outbox.put(migrants)
+        while True:
+            try:
+                population.immigrate(inbox.get_nowait())
+            except Empty:
+                break
+    if population.score() < best:
+        results.put(('best', index, population.score(), population.tours[population.bestIndex].copy(), generations))
+    results.put(('done', index, generations))
+
+# Entry point of an island process
+# @param spec: the spec of the SharedGraph to solve
+def _islandMain(spec, index, inbox, outboxes, results, stop, seed, settings):
+    (memory, graph) = attachGraph(spec)
+    for outbox in outboxes: # migrants left unread at the end must not keep this process alive
+        outbox.cancel_join_thread()
+    try:
+        _runIsland(graph, index, inbox, outboxes, results, stop, seed, settings)
+    finally:
+        del graph
+        memory.close()
+
+# Island-model genetic algorithm
+# @param graph: a weighted graph
+# @param target_score: the tour length to achieve or beat; all islands stop as soon as one does
+# @param islands: number of islands, each in its own process (default one per core)
+# @param topology: migration topology, 'ring' or 'full'
+# @param migration_interval: generations between migrations
+# @param migrants: number of best tours each island sends at every migration
+# @param mutation_rates: one mutation rate per island (default mutation_rate for all of them)
+# @param report: optional function (island, score, tour) called whenever the global best improves
+# @param seed: seed for the islands
+# The remaining parameters are those of genetic.evolve and apply to every island.
+# @return: (best GeneticTSPGraph, its score); the GeneticTSPGraph also records the
+# total generations run and the island that found it
+def islandEvolve(graph, target_score, islands=None, topology='ring', migration_interval=20, migrants=2,
+                 mutation_rates=None, report=None, selection='roulette', tournament_size=3,
+                 population_size=100, mutation_rate=0.05, crossover='ox', memetic_rate=0.0,
+                 max_generations=100000, seed=None):
+
+    if selection not in ('roulette', 'tournament'):
+        raise ValueError("unknown selection strategy: %s" % selection)
+    islands = islands or (len(mutation_rates) if mutation_rates else os.cpu_count() or 1)
+    if mutation_rates is None:
+        mutation_rates = [mutation_rate] * islands
+    if len(mutation_rates) != islands:
+        raise ValueError("need one mutation rate per island")
+    targets = migrationTargets(islands, topology)
+
+    shared = SharedGraph(graph)
+    inboxes = [multiprocessing.Queue() for i in range(islands)]
+    results = multiprocessing.Queue()
+    stop = multiprocessing.Event()
+    processes = []
+    best, bestIsland = (None, float('inf')), None
+    generations = 0
+    try:
+        for (i, islandSeed) in enumerate(runSeeds(seed, islands)):
+            settings = {'target_score': target_score, 'migration_interval': max(1, migration_interval),
+                        'migrants': migrants, 'selection': selection, 'tournament_size': tournament_size,
+                        'population_size': population_size, 'mutation_rate': mutation_rates[i],
+                        'crossover': crossover, 'memetic_rate': memetic_rate, 'max_generations': max_generations}
+            process = multiprocessing.Process(target=_islandMain, args=(shared.spec, i, inboxes[i],
+                                              [inboxes[j] for j in targets[i]], results, stop, islandSeed, settings))
+            process.daemon = True
+            process.start()
+            processes.append(process)
+
+        running = islands
+        while running:
+            try:
+                message = results.get(timeout=1.0)
+            except Empty:
+                if not any(process.is_alive() for process in processes):
+                    raise RuntimeError("island processes exited without finishing")
+                continue
+            if message[0] == 'done':
+                running -= 1
+                generations += message[2]
+            elif message[2] < best[1]:
+                best, bestIsland = (message[3], message[2]), message[1]
+                if report is not None:
+                    report(bestIsland, best[1], graph.tourVertices(best[0]))
+                if best[1] <= target_score:
+                    stop.set()
+    finally:
+        stop.set()
+        for process in processes:
+            process.join()
+        shared.close()
+
+    solution = GeneticTSPGraph(graph, graph.tourVertices(best[0]))
+    solution.generations = generations
+    solution.island = bestIsland
+    return (solution, best[1])
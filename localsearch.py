@@ -0,0 +1,174 @@
+# Authors: Josiah Bartlett and Tom Joyce
+# Purpose: improve TSP tours with 2-opt and Or-opt local search
+
+from collections import deque
+import numpy as np
+
+# Smallest change in tour length that counts as an improvement
+EPSILON = 1e-9
+
+
+# @param graph: a weighted graph
+# @param k: number of candidates per vertex
+# @return: (n x k) int32 array; row i lists the ids of the k vertices closest to vertex id i, nearest first
+# (from a spatial index for coordinate-based graphs, see graph.candidateNeighbors)
+def nearestNeighborLists(graph, k=10):
+    return graph.candidateNeighbors(k)
+
+
+class _Tour(object):
+
+    # An array-backed tour of vertex ids with a position index and don't-look bits
+    # @param tour: list of vertex ids
+    # @param weight: function (i, j) -> weight of edge between vertex ids i and j
+    # @param neighbors: list of candidate-neighbor lists, one per vertex id
+    def __init__(self, tour, weight, neighbors):
+        self.tour = list(tour)
+        self.n = len(self.tour)
+        self.pos = [0] * self.n
+        for (i, v) in enumerate(self.tour):
+            self.pos[v] = i
+        self.weight = weight
+        self.neighbors = neighbors
+        self.active = [True] * self.n
+        self.queue = deque(self.tour)
+
+    def succ(self, v):
+        return self.tour[(self.pos[v] + 1) % self.n]
+
+    def pred(self, v):
+        return self.tour[self.pos[v] - 1]
+
+    # Clear the don't-look bits of the given vertices
+    def wake(self, *vertices):
+        for v in vertices:
+            if not self.active[v]:
+                self.active[v] = True
+                self.queue.append(v)
+
+    # Reverse the tour between positions i and j (inclusive, going forward)
+    def reverse(self, i, j):
+        tour, pos, n = self.tour, self.pos, self.n
+        for k in range(((j - i) % n + 1) // 2):
+            a, b = (i + k) % n, (j - k) % n
+            tour[a], tour[b] = tour[b], tour[a]
+            pos[tour[a]] = a
+            pos[tour[b]] = b
+
+    # Reverse positions i..j or, if shorter, everything else; both give the same cycle
+    def reverseShorter(self, i, j):
+        if 2 * ((j - i) % self.n + 1) > self.n:
+            i, j = (j + 1) % self.n, (i - 1) % self.n
+        self.reverse(i, j)
+
+    # Look for an improving 2-opt move that replaces an edge at a with an edge to a close neighbor
+    # @return: True if a move was made
+    def twoOpt(self, a):
+        weight = self.weight
+        for forward in (True, False):
+            b = self.succ(a) if forward else self.pred(a)
+            wab = weight(a, b)
+            for c in self.neighbors[a]:
+                wac = weight(a, c)
+                if wac >= wab:
+                    break
+                d = self.succ(c) if forward else self.pred(c)
+                if c == b or d == a:
+                    continue
+                delta = wac + weight(b, d) - wab - weight(c, d)
+                if delta < -EPSILON:
+                    if forward:
+                        self.reverseShorter(self.pos[b], self.pos[c])
+                    else:
+                        self.reverseShorter(self.pos[a], self.pos[d])
+                    self.wake(a, b, c, d)
+                    return True
+        return False
+
+    # Look for an improving Or-opt move: a segment of 1-3 vertices that starts or
+    # ends at a is moved, possibly reversed, next to a close neighbor of one of its ends
+    # @return: True if a move was made
+    def orOpt(self, a):
+        weight, tour, pos, n = self.weight, self.tour, self.pos, self.n
+        for length in (1, 2, 3):
+            if n < length + 3:
+                break
+            for s1 in (a, tour[(pos[a] - length + 1) % n]):
+                se = tour[(pos[s1] + length - 1) % n]
+                p, nx = self.pred(s1), self.succ(se)
+                removed = weight(p, s1) + weight(se, nx) - weight(p, nx)
+                if removed <= EPSILON:
+                    continue
+                for (end, other) in ((s1, se), (se, s1)):
+                    for c in self.neighbors[end]:
+                        wce = weight(c, end)
+                        if wce >= removed:
+                            break
+                        if (pos[c] - pos[s1]) % n < length:
+                            continue
+                        for (x, y) in ((c, self.succ(c)), (self.pred(c), c)):
+                            if (pos[x] - pos[s1]) % n < length or (pos[y] - pos[s1]) % n < length:
+                                continue
+                            if x == c:
+                                added = wce + weight(other, y)
+                            else:
+                                added = weight(x, other) + wce
+                            delta = added - weight(x, y) - removed
+                            if delta < -EPSILON:
+                                # The segment ends up as x s1..se y when s1 sits next to x
+                                forward = (x == c) == (end == s1)
+                                self.moveSegment(s1, se, p, nx, x, y, forward)
+                                self.wake(p, nx, x, y, s1, se)
+                                return True
+        return False
+
+    # Move the segment s1..se (between p and nx) between the adjacent vertices x and y,
+    # using two or three reversals on whichever side of the tour is shorter
+    # @param forward: if True the result is x s1..se y, otherwise x se..s1 y
+    def moveSegment(self, s1, se, p, nx, x, y, forward):
+        pos, n = self.pos, self.n
+        if (pos[x] - pos[nx]) % n <= (pos[p] - pos[y]) % n:
+            self.reverse(pos[s1], pos[x])
+            self.reverse(pos[x], pos[nx])
+        else:
+            self.reverse(pos[y], pos[se])
+            self.reverse(pos[p], pos[y])
+        if forward:
+            self.reverse(pos[se], pos[s1])
+
+    # Apply improving moves until no vertex has its don't-look bit clear
+    # @param orOpt: also try Or-opt moves
+    def optimize(self, orOpt):
+        if self.n < 5:
+            return
+        while self.queue:
+            a = self.queue.popleft()
+            self.active[a] = False
+            if self.twoOpt(a) or (orOpt and self.orOpt(a)):
+                self.wake(a)
+
+
+# @param tour: sequence of vertex ids
+# @param weight: function (i, j) -> weight of edge between vertex ids i and j
+# @param neighbors: list of candidate-neighbor id lists, one per vertex id
+# @param orOpt: also try Or-opt moves
+# @return: the locally optimal tour, as a list of vertex ids
+def optimizeIds(tour, weight, neighbors, orOpt=True):
+    state = _Tour(tour, weight, neighbors)
+    state.optimize(orOpt)
+    return state.tour
+
+# 2-opt and Or-opt local search over candidate neighbor lists with don't-look bits
+# Use it on its own or to post-optimize the tours from greedytsp, anneal or evolve
+# @param graph: a weighted graph
+# @param pathlist: a tour, as a list of vertices
+# @param k: number of candidate neighbors per vertex
+# @param orOpt: also try Or-opt moves
+# @param neighbors: precomputed result of nearestNeighborLists
+# @return: (improved pathlist, its length)
+def optimizeTour(graph, pathlist, k=10, orOpt=True, neighbors=None):
+    if neighbors is None:
+        neighbors = nearestNeighborLists(graph, k)
+    tour = optimizeIds(graph.tourIds(pathlist).tolist(), graph.idWeights(), neighbors.tolist(), orOpt)
+    pathlist = graph.tourVertices(np.array(tour, dtype=np.intp))
+    return (pathlist, graph.pathlength(pathlist))
@@ -0,0 +1,133 @@
+# Authors: Josiah Bartlett and Tom Joyce
+# Purpose: lower bounds on the optimal tour length (minimum spanning trees and Held-Karp 1-trees) for certified gaps
+
+import math
+import numpy as np
+from construction import nearestNeighborTour
+from instrumentation import Observer
+
+
+# Prim's algorithm in O(n^2): one row of weights per step and a vectorized key update
+# @param graph: a weighted graph
+# @param penalties: optional array of vertex penalties pi; edge (i, j) then weighs w(i, j) + pi[i] + pi[j]
+# @param exclude: optional vertex id to leave out of the tree
+# @return: (parent array with -1 at the root and at exclude, total weight of the tree)
+def minimumSpanningTree(graph, penalties=None, exclude=None):
+    n = len(graph.vertices())
+    parent = np.full(n, -1, dtype=np.intp)
+    key = np.full(n, np.inf)
+    done = np.zeros(n, dtype=bool)
+    if exclude is not None:
+        done[exclude] = True
+    root = 1 if exclude == 0 else 0
+    if n == 0 or (exclude is not None and n == 1):
+        return (parent, 0.0)
+    key[root] = 0.0
+    total = 0.0
+    for step in range(n - done.sum()):
+        v = int(np.argmin(key))
+        if key[v] == np.inf:
+            raise ValueError("the graph is not connected")
+        total += key[v]
+        done[v] = True
+        key[v] = np.inf
+        row = graph.distanceBlock(v).astype(np.float64)
+        if penalties is not None:
+            row += penalties[v] + penalties
+        better = (row < key) & ~done
+        key[better] = row[better]
+        parent[better] = v
+    return (parent, total)
+
+# @param graph: a weighted graph
+# @param penalties: optional array of vertex penalties
+# @return: (weight of the minimum 1-tree under the penalties, degree of each vertex in it);
+# a 1-tree is a spanning tree of vertices 1..n-1 plus the two cheapest edges at vertex 0
+def oneTree(graph, penalties=None):
+    (parent, total) = minimumSpanningTree(graph, penalties, exclude=0)
+    n = len(parent)
+    degree = np.zeros(n, dtype=np.intp)
+    children = np.flatnonzero(parent >= 0)
+    degree[children] += 1
+    np.add.at(degree, parent[children], 1)
+    row = graph.distanceBlock(0).astype(np.float64)
+    if penalties is not None:
+        row += penalties[0] + penalties
+    row[0] = np.inf
+    closest = np.argpartition(row, 1)[:2]
+    degree[closest] += 1
+    degree[0] = 2
+    return (total + row[closest].sum(), degree)
+
+# Held-Karp lower bound: maximize the penalized 1-tree weight minus 2 sum(pi) over the
+# penalties pi by subgradient ascent, pushing every vertex toward degree 2
+# @param graph: a weighted graph
+# @param iterations: most subgradient steps to take
+# @param upper: length of a known tour, used to size the steps (default: nearest neighbor)
+# @param patience: steps without a better bound before the step size is halved
+# @return: (the bound, the penalties that gave it); a tour's length under the
+# penalized weights w(i, j) + pi[i] + pi[j] is its length plus 2 sum(pi)
+def heldKarpPenalties(graph, iterations=100, upper=None, patience=5):
+    vertices = graph.vertices()
+    n = len(vertices)
+    if n <= 3:
+        return (graph.pathlength(vertices), np.zeros(n))
+    if upper is None:
+        upper = nearestNeighborTour(graph, vertices[0])[1]
+    penalties = np.zeros(n)
+    best, bestPenalties = -np.inf, penalties.copy()
+    scale = 2.0
+    stale = 0
+    for k in range(iterations):
+        (weight, degree) = oneTree(graph, penalties)
+        bound = weight - 2 * penalties.sum()
+        if bound > best + 1e-9:
+            best, bestPenalties = bound, penalties.copy()
+            stale = 0
+        else:
+            stale += 1
+            if stale >= patience:
+                scale /= 2
+                stale = 0
+        gradient = degree - 2
+        norm = float(np.dot(gradient, gradient))
+        if norm == 0 or scale < 1e-6 or best >= upper: # a tour, or no more progress to make
+            break
+        penalties += scale * (upper - bound) / norm * gradient
+    return (min(best, upper), bestPenalties)
+
+# @param graph: a weighted graph
+# @param options: passed on to heldKarpPenalties
+# @return: a lower bound on the length of every tour, rounded up for integer weights
+def heldKarpBound(graph, **options):
+    bound = heldKarpPenalties(graph, **options)[0]
+    if integralWeights(graph):
+        bound = math.ceil(bound - 1e-6)
+    return bound
+
+# @param graph: a weighted graph
+# @return: True if every weight is an integer, so every tour length is too
+def integralWeights(graph):
+    return len(graph.vertices()) > 1 and np.issubdtype(np.asarray(graph.pairWeights(0, 1)).dtype, np.integer)
+
+# @param length: length of a tour
+# @param bound: a lower bound on the optimal length
+# @return: certified relative gap: the tour is at most this fraction longer than optimal
+def optimalityGap(length, bound):
+    if bound <= 0:
+        return 0.0 if length <= bound else float('inf')
+    return max(0.0, (length - bound) / float(bound))
+
+
+class GapStop(Observer):
+
+    # Stops an anneal or evolve run once its best tour is certified within gap of optimal
+    # @param bound: a lower bound on the optimal length, e.g. from heldKarpBound
+    # @param gap: relative gap to stop at, e.g. 0.02 for 2%
+    def __init__(self, bound, gap):
+        self.bound = bound
+        self.gap = gap
+        self.target = bound * (1 + gap)
+
+    def progressed(self, stats):
+        return stats.best <= self.target
@@ -0,0 +1,135 @@
+# Authors: Josiah Bartlett and Tom Joyce
+# Purpose: metric closure of sparse weighted graphs, so the complete-graph TSP solvers can run on road networks
+
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from weightedgraph import WeightedGraph
+
+# Largest graph closed with Floyd-Warshall by default; above it, Dijkstra runs from every source
+FLOYD_LIMIT = 300
+
+# The graph each worker process searches, set up once by _initWorker
+_workerGraph = None
+
+
+# @param csr: the CSRGraph to search
+# Runs once in each worker, so the graph is shipped once per process rather than per task
+def _initWorker(csr):
+    global _workerGraph
+    _workerGraph = csr
+
+# @param csr: a CSRGraph with edge weights
+# @param sources: list of vertex ids
+# @return: (sources, distance rows, predecessor rows) of Dijkstra from each source
+def _dijkstraRows(csr, sources):
+    distances = np.empty((len(sources), csr.n))
+    predecessors = np.empty((len(sources), csr.n), dtype=np.int32)
+    for (k, source) in enumerate(sources):
+        (distances[k], predecessors[k]) = csr.dijkstra(source)
+    return (sources, distances, predecessors)
+
+# @param sources: list of vertex ids
+# @return: _dijkstraRows on the worker's graph
+def _dijkstraInWorker(sources):
+    return _dijkstraRows(_workerGraph, sources)
+
+# All-pairs shortest paths by Floyd-Warshall, one vectorized (n x n) relaxation per middle vertex
+# @param csr: a CSRGraph with edge weights
+# @return: (distance matrix, predecessor matrix); predecessors[s, v] is the vertex before v
+# on a shortest path from s (s itself at v = s, -1 if v is unreachable)
+def floydWarshall(csr):
+    n = csr.n
+    distances = np.full((n, n), np.inf)
+    first = np.repeat(np.arange(n), np.diff(csr.indptr))
+    np.minimum.at(distances, (first, csr.indices), csr.weights.astype(np.float64))
+    np.fill_diagonal(distances, 0)
+    predecessors = np.where(np.isfinite(distances), np.arange(n, dtype=np.int32)[:, None], -1).astype(np.int32)
+    for k in range(n):
+        through = distances[:, k, None] + distances[None, k, :]
+        better = through < distances
+        distances = np.where(better, through, distances)
+        predecessors = np.where(better, predecessors[k][None, :], predecessors)
+    return (distances, predecessors)
+
+# All-pairs shortest paths by Dijkstra from every source, spread over a pool of processes
+# @param csr: a CSRGraph with edge weights
+# @param workers: number of worker processes (None for one per core, 1 for serial)
+# @param chunk: sources per task
+# @return: (distance matrix, predecessor matrix), as from floydWarshall
+def allPairsDijkstra(csr, workers=None, chunk=64):
+    n = csr.n
+    tasks = [list(range(first, min(first + chunk, n))) for first in range(0, n, chunk)]
+    if workers == 1:
+        results = [_dijkstraRows(csr, sources) for sources in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_initWorker, initargs=(csr,)) as pool:
+            results = list(pool.map(_dijkstraInWorker, tasks))
+    distances = np.empty((n, n))
+    predecessors = np.empty((n, n), dtype=np.int32)
+    for (sources, rows, parents) in results:
+        distances[sources] = rows
+        predecessors[sources] = parents
+    return (distances, predecessors)
+
+
+class MetricClosure(object):
+
+    """
+    @param graph: a connected WeightedGraph, usually sparse
+    @param workers: worker processes for the Dijkstra runs (None for one per core, 1 for serial)
+    @param method: 'floyd' or 'dijkstra' (default: floyd up to FLOYD_LIMIT vertices)
+    The closure is the complete graph whose edge (u, v) weighs the length of the shortest
+    u-v path in graph. Every TSP solver runs on self.graph unchanged; expandTour turns
+    its tours back into walks along the edges of the original graph. The shortest-path
+    rows also fill graph's own path cache, so later shortestPathsFrom calls are free.
+    Memory is O(n^2): 12 bytes per vertex pair.
+    """
+    def __init__(self, graph, workers=None, method=None):
+        csr = graph.csr()
+        if method is None:
+            method = 'floyd' if csr.n <= FLOYD_LIMIT else 'dijkstra'
+        if method == 'floyd':
+            (distances, self.predecessors) = floydWarshall(csr)
+        elif method == 'dijkstra':
+            (distances, self.predecessors) = allPairsDijkstra(csr, workers)
+        else:
+            raise ValueError("unknown closure method: %s" % method)
+        if not np.isfinite(distances).all():
+            raise ValueError("the graph is not connected")
+        if np.issubdtype(csr.weights.dtype, np.integer) and distances.max(initial=0) < np.iinfo(np.int32).max:
+            distances = distances.astype(np.int32)
+        self.vertexOrder = list(csr.vertexOrder)
+        self.vertexIds = dict(graph.csrIds)
+        self.distances = distances
+        self.graph = WeightedGraph.fromMatrix(distances, self.vertexOrder)
+        for source in range(min(csr.n, graph.pathCache.capacity)):
+            graph.pathCache.put(source, (distances[source], self.predecessors[source]))
+
+    """
+    @param a, b: vertices
+    @return: list of the vertices on a shortest path [a...b] in the original graph
+    """
+    def path(self, a, b):
+        row = self.predecessors[self.vertexIds[a]]
+        ids = [self.vertexIds[b]]
+        while row[ids[-1]] != ids[-1]:
+            ids.append(int(row[ids[-1]]))
+        ids.reverse()
+        return [self.vertexOrder[i] for i in ids]
+
+    """
+    @param tour: list of vertices, a tour of the closure graph
+    @return: closed walk [tour[0]...tour[0]] along edges of the original graph, of the same length
+    """
+    def expandTour(self, tour):
+        walk = [tour[0]] if tour else []
+        for (a, b) in zip(tour, tour[1:] + tour[:1]):
+            walk.extend(self.path(a, b)[1:])
+        return walk
+
+
+# @param graph: a connected WeightedGraph
+# @param options: passed on to MetricClosure
+# @return: its MetricClosure; solve on closure.graph and expand with closure.expandTour
+def metricClosure(graph, **options):
+    return MetricClosure(graph, **options)
@@ -0,0 +1,166 @@
+# Authors: Josiah Bartlett and Tom Joyce
+# Purpose: parallel tempering, many annealing replicas at fixed temperatures in worker processes that trade states
+
+import math
+import os
+import random
+import multiprocessing
+import numpy as np
+from sharedgraph import SharedGraph, attachGraph
+from simannealing import SimAnnealingTSPGraph, SimAnnealingTSPAgent
+from experiments import runSeeds
+
+
+# One replica: anneal at whatever temperature the master sends, remembering the best tour
+# @param connection: pipe to the master
+# @param graph: the graph rebuilt over shared memory
+# @param seed: seed for the replica's agent
+# @param twoOptRate: fraction of moves that are segment reversals
+def _serveReplica(connection, graph, seed, twoOptRate):
+    agent = SimAnnealingTSPAgent(twoOptRate, seed)
+    tspgraph = SimAnnealingTSPGraph(graph)
+    agent.random.shuffle(tspgraph.pathlist)
+    tspgraph.length = graph.pathlength(tspgraph.pathlist)
+    best = tspgraph.copy()
+    while True:
+        message = connection.recv()
+        if message[0] == 'sweep':
+            (command, temp, steps) = message
+            accepted = agent.sweep(tspgraph, temp, steps) if len(tspgraph.pathlist) >= 4 else 0
+            if tspgraph.length < best.length:
+                best = tspgraph.copy()
+            connection.send((tspgraph.length, accepted))
+        elif message[0] == 'best':
+            connection.send((best.pathlist, best.length))
+        else:
+            return
+
+# Entry point of a replica process
+# @param spec: the spec of the SharedGraph to solve
+def _replicaMain(connection, spec, seed, twoOptRate):
+    (memory, graph) = attachGraph(spec)
+    try:
+        _serveReplica(connection, graph, seed, twoOptRate)
+    finally:
+        del graph
+        memory.close()
+        connection.close()
+
+# Geometric ladder whose hottest rung accepts a typical uphill move with probability 1/e
+# @param graph: a weighted graph
+# @param replicas: number of temperatures
+# @param ratio: hottest / coldest temperature
+# @param samples: random moves used to estimate the typical uphill change
+# @param seed: seed for the sampled moves
+# @return: list of temperatures, coldest first
+def temperatureLadder(graph, replicas, ratio=1000.0, samples=1000, seed=None):
+    tspgraph = SimAnnealingTSPGraph(graph)
+    n = len(tspgraph.pathlist)
+    rng = random.Random(seed)
+    rng.shuffle(tspgraph.pathlist)
+    uphill = []
+    for k in range(samples if n >= 4 else 0):
+        (i, j) = rng.sample(range(n), 2)
+        delta = tspgraph.reverseDelta(i, j) if k % 2 else tspgraph.swapDelta(i, j)
+        if delta > 0:
+            uphill.append(delta)
+    high = float(np.mean(uphill)) if uphill else 1.0
+    if replicas == 1:
+        return [high / ratio]
+    return (high * ratio ** (np.arange(replicas) / (replicas - 1.0) - 1.0)).tolist()
+
+
+class ParallelTempering(object):
+
+    """
+    @param graph: a weighted graph
+    @param replicas: number of replicas (default one per core)
+    @param temperatures: one temperature per replica, coldest first (default temperatureLadder)
+    @param interval: moves each replica tries between exchanges (default 2n)
+    @param seed: seed for the replicas and the exchanges
+    @param twoOptRate: fraction of moves that are segment reversals
+    Every replica is a worker process annealing its own tour at a fixed temperature
+    against one shared copy of the weights. After each interval, neighboring rungs
+    of the ladder swap states with the Metropolis criterion
+    min(1, exp((E_cold - E_hot) (1/T_cold - 1/T_hot))); only the temperatures move,
+    so an exchange costs two small messages, not a tour transfer.
+    """
+    def __init__(self, graph, replicas=None, temperatures=None, interval=None, seed=None, twoOptRate=0.5):
+        self.graph = graph
+        self.replicas = replicas or (len(temperatures) if temperatures else os.cpu_count() or 1)
+        seeds = runSeeds(seed, self.replicas + 1)
+        self.temperatures = list(temperatures) if temperatures else temperatureLadder(graph, self.replicas, seed=seeds[-1])
+        if len(self.temperatures) != self.replicas:
+            raise ValueError("need one temperature per replica")
+        self.interval = interval or 2 * len(graph.vertices())
+        self.seeds = seeds[:-1]
+        self.random = random.Random(seeds[-1])
+        self.twoOptRate = twoOptRate
+        self.attempts = [0] * (self.replicas - 1) # exchange attempts between rungs k and k+1
+        self.swaps = [0] * (self.replicas - 1)
+        self.evaluations = 0
+
+    """
+    @param rounds: number of sweep-and-exchange rounds
+    @return: (shortest tour any replica has seen, its length)
+    """
+    def run(self, rounds=200):
+        shared = SharedGraph(self.graph)
+        connections, processes = [], []
+        try:
+            for r in range(self.replicas):
+                (mine, theirs) = multiprocessing.Pipe()
+                process = multiprocessing.Process(target=_replicaMain,
+                                                  args=(theirs, shared.spec, self.seeds[r], self.twoOptRate))
+                process.daemon = True
+                process.start()
+                theirs.close()
+                connections.append(mine)
+                processes.append(process)
+
+            rung = list(range(self.replicas)) # rung[k] is the replica at temperature k
+            for round in range(rounds):
+                for (k, r) in enumerate(rung):
+                    connections[r].send(('sweep', self.temperatures[k], self.interval))
+                energy = [connection.recv()[0] for connection in connections]
+                self.evaluations += self.replicas * self.interval
+                for k in range(round % 2, self.replicas - 1, 2): # alternate even and odd pairs
+                    cold, hot = rung[k], rung[k + 1]
+                    x = (energy[cold] - energy[hot]) * (1.0 / self.temperatures[k] - 1.0 / self.temperatures[k + 1])
+                    self.attempts[k] += 1
+                    if x >= 0 or self.random.random() < math.exp(x):
+                        rung[k], rung[k + 1] = hot, cold
+                        self.swaps[k] += 1
+
+            best = None
+            for connection in connections:
+                connection.send(('best',))
+                (tour, length) = connection.recv()
+                if best is None or length < best[1]:
+                    best = (tour, length)
+            return best
+        finally:
+            for connection in connections:
+                try:
+                    connection.send(('stop',))
+                except (OSError, EOFError):
+                    pass
+                connection.close()
+            for process in processes:
+                process.join()
+            shared.close()
+
+    """
+    @return: fraction of accepted exchanges between each pair of neighboring rungs
+    """
+    def exchangeRates(self):
+        return [float(s) / a if a else 0.0 for (s, a) in zip(self.swaps, self.attempts)]
+
+
+# Parallel tempering on one instance; see ParallelTempering
+# @param graph: a weighted graph
+# @param rounds: number of sweep-and-exchange rounds
+# @param options: passed on to ParallelTempering
+# @return: (shortest tour found, its length)
+def parallelTempering(graph, rounds=200, **options):
+    return ParallelTempering(graph, **options).run(rounds)
@@ -0,0 +1,78 @@
+# Authors: Josiah Bartlett and Tom Joyce
+# Purpose: hand a graph's weights to worker processes through one block of shared memory
+
+from multiprocessing import shared_memory
+import numpy as np
+from weightedgraph import WeightedGraph
+from euclideangraph import EuclideanGraph
+from tspio import openInstance
+
+
+class SharedArray(object):
+
+    """
+    @param array: numpy array to copy into a new block of shared memory
+    The block lives until close() is called; workers map it with attach().
+    """
+    def __init__(self, array):
+        array = np.ascontiguousarray(array)
+        self.memory = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        self.spec = (self.memory.name, array.shape, array.dtype.str)
+        self.array = np.ndarray(array.shape, dtype=array.dtype, buffer=self.memory.buf)
+        self.array[...] = array
+
+    """
+    @param spec: (name, shape, dtype) of a SharedArray
+    @return: (the SharedMemory, a numpy view of it); drop the view before closing the memory
+    """
+    @staticmethod
+    def attach(spec):
+        (name, shape, dtype) = spec
+        try:
+            memory = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError: # before Python 3.13 every attach is tracked
+            memory = shared_memory.SharedMemory(name=name)
+        return (memory, np.ndarray(shape, dtype=dtype, buffer=memory.buf))
+
+    def close(self):
+        self.array = None
+        self.memory.close()
+        self.memory.unlink()
+
+
+class SharedGraph(object):
+
+    """
+    @param graph: a weighted graph
+    Shares the coordinates of an EuclideanGraph that has no cached matrix, and
+    the dense distance matrix of anything else. A graph read from a binary file
+    (see tspio) is not copied at all: the workers map the same file. spec is small
+    and picklable; pass it to the workers and rebuild the graph there with attachGraph.
+    """
+    def __init__(self, graph):
+        self.shared = None
+        if getattr(graph, 'mappedPath', None) is not None:
+            self.spec = ('file', graph.mappedPath, graph.vertexOrder)
+            return
+        if isinstance(graph, EuclideanGraph) and graph.distanceMatrix is None:
+            (kind, array) = ('points', graph.coordinates)
+        else:
+            (kind, array) = ('matrix', graph.denseMatrix())
+        self.shared = SharedArray(array)
+        self.spec = (kind, self.shared.spec, graph.vertexOrder)
+
+    def close(self):
+        if self.shared is not None:
+            self.shared.close()
+
+
+# @param spec: the spec of a SharedGraph
+# @return: (the SharedMemory or mmap, the graph over it); drop the graph before closing the memory
+def attachGraph(spec):
+    (kind, arraySpec, vertices) = spec
+    if kind == 'file':
+        return openInstance(arraySpec, cacheLimit=0)
+    (memory, array) = SharedArray.attach(arraySpec)
+    if kind == 'matrix':
+        return (memory, WeightedGraph.fromMatrix(array, vertices))
+    return (memory, EuclideanGraph(array, cacheLimit=0))
@@ -3,15 +3,19 @@
 
 import math
 import random
+import timeit
 from itertools import combinations
 from graphGenerator import graphGenerator
+from instrumentation import RunStats
+from cooling import coolingSchedule
 
 class SimAnnealingTSPGraph(object):
 
     # @param graph: a weighted graph
     def __init__(self, graph):
         self.graph = graph
-        self.pathlist = graph.vertices()
+        self.pathlist = list(graph.vertices())
+        self.length = graph.pathlength(self.pathlist)
 
     # @return: a list of available moves
     # A move is a swap of two vertex indices, represented as a tuple
@@ -20,10 +24,10 @@ class SimAnnealingTSPGraph(object):
 
     # @return: a copy of this graph
     def copy(self):
-        copy = SimAnnealingTSPGraph(self.graph)
-        for v in self.pathlist:
-            copy.pathlist[v] = self.pathlist[v]
-
+        copy = SimAnnealingTSPGraph.__new__(SimAnnealingTSPGraph)
+        copy.graph = self.graph
+        copy.pathlist = list(self.pathlist)
+        copy.length = self.length
         return copy
 
     # @param move: an available move, represented as tuple of two indices
@@ -35,29 +39,185 @@ class SimAnnealingTSPGraph(object):
             temp = neighbor.pathlist[v1]
             neighbor.pathlist[v1] = neighbor.pathlist[v2]
             neighbor.pathlist[v2] = temp
+        neighbor.length = self.graph.pathlength(neighbor.pathlist)
         return neighbor
 
+    # @param i, j: two distinct tour positions
+    # @return: the change in tour length from swapping the vertices at i and j
+    # Only the (at most four) edges touching the two positions are looked at
+    def swapDelta(self, i, j):
+        path = self.pathlist
+        n = len(path)
+        if i > j:
+            i, j = j, i
+        if n < 4:
+            return 0
+        if j == i + 1:
+            return self.__adjacentSwapDelta(i, j)
+        if i == 0 and j == n - 1:
+            return self.__adjacentSwapDelta(j, i)
+        w = self.graph.edgeWeight
+        a, b = path[i], path[j]
+        ap, an = path[i-1], path[(i+1) % n]
+        bp, bn = path[j-1], path[(j+1) % n]
+        removed = w(ap, a) + w(a, an) + w(bp, b) + w(b, bn)
+        added = w(ap, b) + w(b, an) + w(bp, a) + w(a, bn)
+        return added - removed
+
+    # @param i, j: tour positions with j directly after i
+    # @return: the change in tour length from swapping the vertices at i and j
+    def __adjacentSwapDelta(self, i, j):
+        path = self.pathlist
+        n = len(path)
+        w = self.graph.edgeWeight
+        a, b = path[i], path[j]
+        ap, bn = path[i-1], path[(j+1) % n]
+        return w(ap, b) + w(a, bn) - w(ap, a) - w(b, bn)
+
+    # @param i, j: two distinct tour positions
+    # @return: the change in tour length from reversing the segment i..j (a 2-opt move)
+    def reverseDelta(self, i, j):
+        path = self.pathlist
+        n = len(path)
+        if i > j:
+            i, j = j, i
+        if i == 0 and j == n - 1:
+            return 0
+        w = self.graph.edgeWeight
+        a, b = path[i-1], path[i]
+        c, d = path[j], path[(j+1) % n]
+        return w(a, c) + w(b, d) - w(a, b) - w(c, d)
+
+    # Swap the vertices at positions i and j in place
+    # @param delta: the change in tour length, as returned by swapDelta
+    def swap(self, i, j, delta):
+        path = self.pathlist
+        path[i], path[j] = path[j], path[i]
+        self.length += delta
+
+    # Reverse the segment i..j in place, going the shorter way around the tour
+    # @param delta: the change in tour length, as returned by reverseDelta
+    def reverse(self, i, j, delta):
+        path = self.pathlist
+        n = len(path)
+        if i > j:
+            i, j = j, i
+        inner = j - i + 1
+        if 2 * inner > n:
+            i, j = j + 1, i - 1 + n
+            inner = n - inner
+        for k in range(inner // 2):
+            a, b = (i + k) % n, (j - k) % n
+            path[a], path[b] = path[b], path[a]
+        self.length += delta
+
 class SimAnnealingTSPAgent(object):
 
+    # @param twoOptRate: fraction of moves that are segment reversals rather than swaps
+    # @param seed: seed for this agent's random number generator
+    # @param schedule: cooling schedule, an object or name from the cooling module (default: the fixed schedule)
+    def __init__(self, twoOptRate=0.5, seed=None, schedule=None):
+        self.twoOptRate = twoOptRate
+        self.random = random.Random(seed)
+        self.schedule = coolingSchedule(schedule)
+        self.evaluations = 0 # moves evaluated by the last anneal
+        self.stats = None # RunStats of the last anneal
+
     # @param tspgraph: a weighted graph
+    # @param observer: optional instrumentation.Observer, told about each temperature; it can stop the run
+    # @param shuffle: start from a random tour rather than from tspgraph's current one
+    # @param warmStart: optional tour (list of vertices) to start from, e.g. a cached or repaired one;
+    # the schedule then starts cooler, so the tour is refined rather than scrambled
+    # @param checkpoint: optional checkpoint.Checkpoint; the run resumes from it if it holds a state,
+    # and writes the tour, temperature, schedule, counters and random number generator state to it as it goes
     # @return: a weighted graph with its tour (pathlist) improved by simulated annealing
-    def anneal(self, tspgraph):
-        temp = 1.0 # initial temp
-        random.shuffle(tspgraph.pathlist)
-        while temp > 0.001: # almost zero
-            count = 0
-            moves = []
-            while count <= len(tspgraph.pathlist)/50:
-                moves.append(random.choice(tspgraph.moves()))
-                moves.append(random.choice(tspgraph.moves()))
-                count += 1
-            neighbor = tspgraph.neighbor(moves)
-            old_value, new_value = tspgraph.graph.pathlength(tspgraph.pathlist), neighbor.graph.pathlength(neighbor.pathlist)
-            if new_value <= old_value:
-                tspgraph = neighbor
-                diff = (new_value - old_value)  # must be negative
-                p = math.exp(diff/temp)
-                if random.random() < p: # with probability p
-                    tspgraph = neighbor
-            temp *= 0.999 # decay
+    # Each move is a random pair of tour positions, scored by its change in length
+    # and applied in place only if accepted. The schedule sets the temperatures and
+    # the moves tried at each. Counters for the run are left in self.stats.
+    def anneal(self, tspgraph, observer=None, shuffle=True, warmStart=None, checkpoint=None):
+        rng = self.random
+        schedule = self.schedule
+        stats = self.stats = RunStats('anneal')
+        state = None
+        if checkpoint is not None:
+            settings = {'vertices': len(tspgraph.pathlist), 'twoOptRate': self.twoOptRate,
+                        'schedule': type(schedule).__name__}
+            state = checkpoint.load('anneal', settings)
+        accepted = 0
+        steps = 0
+        if state is not None:
+            tspgraph.pathlist = list(state['pathlist'])
+            tspgraph.length = state['length']
+            rng.setstate(state['rng'])
+            schedule.__dict__.update(state['schedule'])
+            (temp, steps, accepted, self.evaluations) = (state['temp'], state['steps'], state['accepted'], state['evaluations'])
+            stats.restore(state['stats'])
+        else:
+            if warmStart is not None:
+                tspgraph.pathlist = list(warmStart)
+            elif shuffle:
+                rng.shuffle(tspgraph.pathlist)
+            tspgraph.length = tspgraph.graph.pathlength(tspgraph.pathlist)
+            n = len(tspgraph.pathlist)
+            if n >= 4: # below 4 vertices every tour has the same length
+                (temp, steps) = schedule.start(self, tspgraph, warmStart is not None)
+            else:
+                temp = None
+            self.evaluations = schedule.calibrationMoves if n >= 4 else 0
+            stats.offer(tspgraph.length)
+        stats.addPhase('initialize', stats.elapsed())
+        if observer is not None:
+            observer.started(stats)
+            observer.improved(stats, tspgraph.pathlist)
+        start = timeit.default_timer()
+        while temp is not None:
+            moved = self.sweep(tspgraph, temp, steps)
+            accepted += moved
+            self.evaluations += steps
+            stats.iterations += 1
+            improved = stats.offer(tspgraph.length)
+            if observer is not None:
+                stats.evaluations, stats.acceptances, stats.temperature = self.evaluations, accepted, temp
+                if improved:
+                    observer.improved(stats, tspgraph.pathlist)
+                if observer.progressed(stats):
+                    break
+            temp = schedule.cool(temp, moved, steps, improved)
+            if checkpoint is not None and checkpoint.due(stats.iterations):
+                stats.evaluations, stats.acceptances = self.evaluations, accepted
+                checkpoint.save({'solver': 'anneal', 'settings': settings, 'pathlist': tspgraph.pathlist,
+                                 'length': tspgraph.length, 'rng': rng.getstate(), 'schedule': dict(schedule.__dict__),
+                                 'temp': temp, 'steps': steps, 'accepted': accepted,
+                                 'evaluations': self.evaluations, 'stats': stats.asDict()})
+        stats.evaluations, stats.acceptances = self.evaluations, accepted
+        stats.addPhase('search', timeit.default_timer() - start)
+        stats.stop()
+        if observer is not None:
+            observer.finished(stats)
         return tspgraph
+
+    # Try a number of random moves at one fixed temperature, applying the accepted ones in place
+    # @param tspgraph: a SimAnnealingTSPGraph with at least 4 vertices
+    # @param temp: the temperature
+    # @param steps: number of moves to try
+    # @return: number of moves accepted
+    def sweep(self, tspgraph, temp, steps):
+        rng = self.random
+        n = len(tspgraph.pathlist)
+        accepted = 0
+        for step in range(steps):
+            i = rng.randrange(n)
+            j = rng.randrange(n - 1)
+            if j >= i:
+                j += 1
+            if rng.random() < self.twoOptRate:
+                delta = tspgraph.reverseDelta(i, j)
+                if delta <= 0 or rng.random() < math.exp(-delta/temp):
+                    tspgraph.reverse(i, j, delta)
+                    accepted += 1
+            else:
+                delta = tspgraph.swapDelta(i, j)
+                if delta <= 0 or rng.random() < math.exp(-delta/temp):
+                    tspgraph.swap(i, j, delta)
+                    accepted += 1
+        return accepted
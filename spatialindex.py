@@ -0,0 +1,161 @@
+# Authors: Josiah Bartlett and Tom Joyce
+# Purpose: a uniform grid over planar points for k-nearest candidate lists, and the sparse candidate graph they form
+
+import math
+import numpy as np
+from weightedgraph import WeightedGraph
+from csrgraph import CSRGraph, ShortestPathCache
+
+class GridIndex(object):
+
+    """
+    @param coordinates: (n x 2) array of points
+    @param pointsPerCell: average number of points per grid cell
+    Buckets the points into square cells; the points of each grid row of cells
+    are stored contiguously, sorted by cell, so any run of cells is one slice.
+    """
+    def __init__(self, coordinates, pointsPerCell=2.0):
+        self.coordinates = np.asarray(coordinates, dtype=np.float64)
+        n = len(self.coordinates)
+        low = self.coordinates.min(axis=0) if n else np.zeros(2)
+        high = self.coordinates.max(axis=0) if n else np.ones(2)
+        extent = np.maximum(high - low, 1e-12)
+        self.cellSize = max(math.sqrt(extent[0] * extent[1] * pointsPerCell / max(n, 1)), extent.max() / 4096.0)
+        self.low = low
+        self.width = int(extent[0] // self.cellSize) + 1
+        self.height = int(extent[1] // self.cellSize) + 1
+        cells = self.cellOf(self.coordinates)
+        self.order = np.argsort(cells, kind='stable')
+        self.cellStart = np.searchsorted(cells[self.order], np.arange(self.width * self.height + 1))
+        self.cells = cells
+
+    """
+    @param points: (m x 2) array of points
+    @return: grid cell id (row * width + column) of each point
+    """
+    def cellOf(self, points):
+        column = np.clip(((points[:, 0] - self.low[0]) // self.cellSize).astype(np.intp), 0, self.width - 1)
+        row = np.clip(((points[:, 1] - self.low[1]) // self.cellSize).astype(np.intp), 0, self.height - 1)
+        return row * self.width + column
+
+    """
+    @param cell: grid cell id
+    @param radius: number of cell rings around it
+    @return: ids of the points in the (2 radius + 1)^2 square of cells centered on cell
+    """
+    def pointsAround(self, cell, radius):
+        row, column = divmod(cell, self.width)
+        left, right = max(column - radius, 0), min(column + radius, self.width - 1)
+        slices = []
+        for r in range(max(row - radius, 0), min(row + radius, self.height - 1) + 1):
+            slices.append(self.order[self.cellStart[r * self.width + left]:self.cellStart[r * self.width + right + 1]])
+        return np.concatenate(slices)
+
+    """
+    @param k: number of neighbors per point
+    @return: (n x k) int32 array; row i lists the k points closest to point i, nearest first
+    Each occupied cell grows its square of searched cells until it holds k other
+    points and the k-th distance is within the square's inner radius, which makes
+    the result exact. Roughly O(n k log k) for evenly spread points.
+    """
+    def kNearest(self, k):
+        n = len(self.coordinates)
+        k = max(0, min(k, n - 1))
+        neighbors = np.empty((n, k), dtype=np.int32)
+        if k == 0:
+            return neighbors
+        for cell in np.flatnonzero(np.diff(self.cellStart)).tolist():
+            queries = self.order[self.cellStart[cell]:self.cellStart[cell + 1]]
+            radius = 1
+            while True:
+                candidates = self.pointsAround(cell, radius)
+                if len(candidates) > k:
+                    difference = self.coordinates[queries][:, None, :] - self.coordinates[candidates]
+                    distances = np.einsum('...i,...i->...', difference, difference)
+                    distances[candidates[None, :] == queries[:, None]] = np.inf
+                    closest = np.argpartition(distances, k - 1, axis=1)[:, :k]
+                    kth = np.take_along_axis(distances, closest, axis=1)
+                    covered = radius >= max(self.width, self.height)
+                    if covered or kth.max() <= (radius * self.cellSize) ** 2:
+                        order = np.argsort(kth, axis=1, kind='stable')
+                        neighbors[queries] = candidates[np.take_along_axis(closest, order, axis=1)]
+                        break
+                radius += 1
+        return neighbors
+
+
+class CandidateGraph(WeightedGraph):
+
+    """
+    @param graph: a weighted graph (dense or coordinate-based)
+    @param neighbors: (n x k) array of candidate neighbor ids, e.g. from graph.candidateNeighbors(k)
+    A sparse view of graph that keeps only the candidate edges, made symmetric,
+    in compressed rows: the neighbors of vertex id i are ids[start[i]:start[i+1]].
+    Weights, tours and vertex ids are delegated to graph.
+    """
+    def __init__(self, graph, neighbors):
+        self.graph = graph
+        self.adjacencyMap = None
+        self.distanceMatrix = None
+        self.vertexOrder = graph.vertexOrder
+        self.vertexIds = graph.vertexIds
+        self.identityIds = graph.identityIds
+        self.neighbors = np.asarray(neighbors)
+        n = len(self.neighbors)
+        first = np.repeat(np.arange(n), self.neighbors.shape[1])
+        second = self.neighbors.ravel().astype(np.intp)
+        edges = np.unique(np.concatenate([first * n + second, second * n + first]))
+        self.start = np.searchsorted(edges // n, np.arange(n + 1))
+        self.ids = (edges % n).astype(np.int32)
+
+    """
+    @return: list of candidate neighbors of v
+    """
+    def neighborsOf(self, v):
+        i = self.graph.tourIds([v])[0]
+        return self.graph.tourVertices(self.ids[self.start[i]:self.start[i + 1]])
+
+    """
+    @params v,u: vertices
+    @return: weight of the candidate edge v->u
+    """
+    def edgeWeight(self, v, u):
+        i, j = self.graph.tourIds([v, u])
+        if j not in self.ids[self.start[i]:self.start[i + 1]]:
+            raise KeyError(u)
+        return self.graph.edgeWeight(v, u)
+
+    def candidateNeighbors(self, k=10):
+        return self.neighbors[:, :k]
+
+    """
+    @return: the candidate edges as a CSRGraph with weights (the arrays are shared, not copied)
+    """
+    def csr(self):
+        if getattr(self, 'csrGraph', None) is None:
+            rows = np.repeat(np.arange(len(self.start) - 1), np.diff(self.start))
+            self.csrGraph = CSRGraph(self.start, self.ids, self.graph.pairWeights(rows, self.ids), self.vertexOrder)
+            self.csrIds = self.vertexIds
+            self.pathCache = ShortestPathCache(self.csrGraph)
+        return self.csrGraph
+
+    def denseMatrix(self):
+        return self.graph.denseMatrix()
+
+    def distanceBlock(self, rows):
+        return self.graph.distanceBlock(rows)
+
+    def pairWeights(self, first, second):
+        return self.graph.pairWeights(first, second)
+
+    def idWeights(self):
+        return self.graph.idWeights()
+
+    def tourIds(self, pathlist):
+        return self.graph.tourIds(pathlist)
+
+    def tourVertices(self, tour):
+        return self.graph.tourVertices(tour)
+
+    def pathlength(self, pathlist):
+        return self.graph.pathlength(pathlist)
@@ -0,0 +1,34 @@
+# Authors: Josiah Bartlett and Tom Joyce
+# Purpose: shortest paths and the metric closure on the sparse candidate graph
+
+import numpy as np
+from graphGenerator import graphGenerator
+from spatialindex import CandidateGraph
+from metricclosure import MetricClosure
+
+
+# @return: the candidate graph of a small Euclidean instance, and the instance itself
+def _candidateGraph(n=40, k=6):
+    graph = graphGenerator(n, 0, 1000, euclidean=True, seed=5).wgraph
+    return (CandidateGraph(graph, graph.candidateNeighbors(k)), graph)
+
+def test_shortestPathsFrom():
+    (cg, graph) = _candidateGraph()
+    v = cg.vertices()[0]
+    paths = cg.shortestPathsFrom(v)
+    assert set(paths) == set(cg.vertices())
+    for (u, path) in paths.items():
+        path = list(path)
+        assert path[0] == v and path[-1] == u
+        for (a, b) in zip(path, path[1:]):
+            assert b in cg.neighborsOf(a)
+
+def test_metricClosure():
+    (cg, graph) = _candidateGraph()
+    closure = MetricClosure(cg, workers=1)
+    (distances, parents) = cg.csr().dijkstra(0)
+    assert np.allclose(closure.distances[0], distances)
+    tour = closure.graph.vertices()
+    walk = closure.expandTour(tour)
+    assert walk[0] == walk[-1] == tour[0]
+    assert np.isclose(sum(graph.edgeWeight(a, b) for (a, b) in zip(walk, walk[1:])), closure.graph.pathlength(tour))
@@ -0,0 +1,227 @@
+# Authors: Josiah Bartlett and Tom Joyce
+# Purpose: cache tours of solved instances, and repair cached tours to warm-start slightly changed ones
+
+import hashlib
+import os
+import pickle
+from collections import OrderedDict
+import numpy as np
+from euclideangraph import EuclideanGraph
+from construction import nearestNeighborTour
+from localsearch import optimizeTour
+from simannealing import SimAnnealingTSPGraph, SimAnnealingTSPAgent
+from genetic import evolve
+
+
+# @param graph: a weighted graph
+# @return: hex digest naming the instance: its vertices and the weights between them, whatever
+# order the graph holds them in (points of an EuclideanGraph are taken in id order)
+def instanceKey(graph):
+    digest = hashlib.sha256()
+    if isinstance(graph, EuclideanGraph):
+        digest.update(b'points')
+        digest.update(graph.coordinates.tobytes())
+        return digest.hexdigest()[:32]
+    vertices = graph.vertices()
+    try:
+        vertices = sorted(vertices)
+    except TypeError:
+        pass
+    ids = graph.tourIds(vertices)
+    if (ids == np.arange(len(ids))).all():
+        weights = graph.denseMatrix()
+    else:
+        weights = graph.pairWeights(ids[:, None], ids[None, :])
+    digest.update(repr(vertices).encode('utf-8'))
+    digest.update(weights.dtype.str.encode('ascii'))
+    digest.update(np.ascontiguousarray(weights).tobytes())
+    return digest.hexdigest()[:32]
+
+# Fit a tour of other vertices to graph: drop the vertices graph lacks, then insert each
+# missing one where it adds the least length (cheapest insertion)
+# @param graph: a weighted graph
+# @param tour: list of vertices, some of which may not be in graph
+# @return: (tour of exactly the vertices of graph, its length)
+def repairTour(graph, tour):
+    vertices = graph.vertices()
+    present = set(vertices)
+    kept = [v for v in tour if v in present]
+    if not kept:
+        return nearestNeighborTour(graph, vertices[0]) if vertices else ([], 0)
+    placed = set(kept)
+    ids = graph.tourIds(kept).tolist()
+    for i in graph.tourIds([v for v in vertices if v not in placed]).tolist():
+        a = np.array(ids)
+        b = np.roll(a, -1)
+        added = graph.pairWeights(a, i) + graph.pairWeights(i, b) - graph.pairWeights(a, b)
+        ids.insert(int(np.argmin(added)) + 1, i)
+    tour = graph.tourVertices(np.array(ids, dtype=np.intp))
+    return (tour, graph.pathlength(tour))
+
+
+class TourCache(object):
+
+    """
+    @param capacity: most tours kept
+    @param maxVertices: most vertices over all the tours kept (None for no bound)
+    @param path: optional file the cache persists in; read now if it exists, written by save
+    @param maxChange: largest fraction of its vertices an instance may gain or lose for a
+    cached tour to be repaired for it
+    Tours are kept by instance key, and dropped least recently used first once either
+    bound is passed. Near misses are matched by vertex, so they only help when vertices
+    name the same stops from one instance to the next (e.g. the stop ids of one network).
+    """
+    def __init__(self, capacity=1024, maxVertices=None, path=None, maxChange=0.25):
+        self.capacity = capacity
+        self.maxVertices = maxVertices
+        self.path = path
+        self.maxChange = maxChange
+        self.entries = OrderedDict() # key -> (tour, length, frozenset of its vertices)
+        self.vertexCount = 0
+        self.hits = 0
+        self.repairs = 0
+        self.misses = 0
+        if path is not None and os.path.exists(path):
+            self.load(path)
+
+    def __len__(self):
+        return len(self.entries)
+
+    """
+    @param graph: a weighted graph
+    @param key: the instance's key (default: instanceKey(graph)); callers that already
+    name their instances can pass that name and skip the hashing
+    @return: (tour, length) cached for exactly this instance, or None
+    """
+    def get(self, graph, key=None):
+        key = instanceKey(graph) if key is None else key
+        if key not in self.entries:
+            return None
+        self.entries.move_to_end(key)
+        (tour, length, vertices) = self.entries[key]
+        return (list(tour), length)
+
+    """
+    @param graph: a weighted graph
+    @return: the cached tour whose vertices differ least from graph's (within maxChange), or None
+    """
+    def nearest(self, graph):
+        vertices = set(graph.vertices())
+        limit = int(self.maxChange * len(vertices))
+        best, bestChange = None, limit + 1
+        for (key, (tour, length, cached)) in self.entries.items():
+            if abs(len(cached) - len(vertices)) >= bestChange:
+                continue
+            change = len(cached.symmetric_difference(vertices))
+            if change < bestChange:
+                best, bestChange = key, change
+        if best is None:
+            return None
+        self.entries.move_to_end(best)
+        return list(self.entries[best][0])
+
+    """
+    @param graph: a weighted graph
+    @param key: the instance's key (default: instanceKey(graph))
+    @return: (tour, length, 'hit') for a cached instance, (repaired tour, length, 'repaired')
+    for a near miss, or None; counted in hits, repairs and misses
+    """
+    def lookup(self, graph, key=None):
+        found = self.get(graph, key)
+        if found is not None:
+            self.hits += 1
+            return found + ('hit',)
+        tour = self.nearest(graph)
+        if tour is None:
+            self.misses += 1
+            return None
+        self.repairs += 1
+        return repairTour(graph, tour) + ('repaired',)
+
+    """
+    @param graph: a weighted graph
+    @param tour: a tour of graph
+    @param length: its length
+    @param key: the instance's key (default: instanceKey(graph))
+    """
+    def put(self, graph, tour, length, key=None):
+        self.__store(instanceKey(graph) if key is None else key, list(tour), length)
+
+    """
+    @param key: instance key
+    @param tour: list of vertices
+    @param length: its length
+    Stores the tour, then drops the least recently used ones while over either bound
+    """
+    def __store(self, key, tour, length):
+        if key in self.entries:
+            self.vertexCount -= len(self.entries[key][0])
+        self.entries[key] = (tour, length, frozenset(tour))
+        self.entries.move_to_end(key)
+        self.vertexCount += len(tour)
+        while len(self.entries) > self.capacity or \
+              (self.maxVertices is not None and self.vertexCount > self.maxVertices and len(self.entries) > 1):
+            (old, entry) = self.entries.popitem(last=False)
+            self.vertexCount -= len(entry[0])
+
+    """
+    Forgets every tour
+    """
+    def clear(self):
+        self.entries.clear()
+        self.vertexCount = 0
+
+    """
+    @param path: file to write (default: the cache's path); written whole, then moved into place
+    """
+    def save(self, path=None):
+        path = path or self.path
+        temporary = path + '.tmp'
+        with open(temporary, 'wb') as f:
+            pickle.dump([(key, tour, length) for (key, (tour, length, vertices)) in self.entries.items()],
+                        f, pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, path)
+
+    """
+    @param path: file written by save; its tours are added, the oldest first
+    """
+    def load(self, path):
+        with open(path, 'rb') as f:
+            entries = pickle.load(f)
+        for (key, tour, length) in entries:
+            self.__store(key, tour, length)
+
+
+# Solve through a cache: a cached instance returns its tour at once; a near miss has its
+# repaired tour improved by the solver, warm started; anything else is solved cold
+# @param graph: a weighted graph
+# @param cache: a TourCache, which the tour found is put in
+# @param solver: 'local' (2-opt/Or-opt from the warm start or a nearest-neighbor tour),
+# 'anneal' or 'evolve'
+# @param seed: seed for the annealing agent or the genetic algorithm
+# @param key: the instance's key (default: instanceKey(graph))
+# @param options: passed on to evolve (which needs target_score) or to the annealing agent
+# @return: (tour, length)
+def solveCached(graph, cache, solver='local', seed=None, key=None, **options):
+    key = instanceKey(graph) if key is None else key
+    found = cache.lookup(graph, key)
+    if found is not None and found[2] == 'hit':
+        return found[:2]
+    warmStart = found[0] if found is not None else None
+    n = len(graph.vertices())
+    if solver == 'local':
+        (tour, length) = found[:2] if found is not None else nearestNeighborTour(graph, graph.vertices()[0])
+        if n >= 5:
+            (tour, length) = optimizeTour(graph, tour, k=min(10, n - 1))
+    elif solver == 'anneal':
+        tspgraph = SimAnnealingTSPAgent(seed=seed, **options).anneal(SimAnnealingTSPGraph(graph), warmStart=warmStart)
+        (tour, length) = (tspgraph.pathlist, tspgraph.length)
+    elif solver == 'evolve':
+        (best, length) = evolve(graph, seed=seed, seed_tours=[warmStart] if warmStart else None, **options)
+        tour = best.pathlist
+    else:
+        raise ValueError("unknown solver: %s" % solver)
+    if found is not None and found[1] < length: # never hand back worse than the repaired tour
+        (tour, length) = found[:2]
+    cache.put(graph, tour, length, key)
+    return (tour, length)
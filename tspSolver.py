@@ -1,18 +1,19 @@
 # Authors: Josiah Bartlett and Tom Joyce
 # Purpose: Test and yield results for solving the TSP problem with 3 different algorithms
 
-import random
 import timeit
 from graphGenerator import graphGenerator
-from simannealing import SimAnnealingTSPGraph, SimAnnealingTSPAgent
-from genetic import evolve
+from experiments import runExperiment
+from heldkarp import heldKarp
 
 
 # Solving the Traveling Salesman problem with 3 different algorithms
-def solve():
+# @param seed: master seed for the graph and the annealing and genetic runs
+# @param workers: number of worker processes (None for one per core, 1 for serial)
+def solve(seed=None, workers=None):
 
     # Create the weighted graph object used for all tests
-    graphgen = graphGenerator(10, 20, 100)
+    graphgen = graphGenerator(10, 20, 100, seed=seed)
     randomgraph = graphgen.wgraph
 
 
@@ -21,83 +22,70 @@ def solve():
     startgreedy = timeit.default_timer()
     greedyresult = randomgraph.greedytsp(0)
     elapsedgreedy = timeit.default_timer() - startgreedy
-    print "Final length of Greedy TSP Tour:", greedyresult[1]
-    # print "Final Greedy TSP Algorithm pathlist:", greedyresult[0]
+    print("Final length of Greedy TSP Tour:", greedyresult[1])
+    # print("Final Greedy TSP Algorithm pathlist:", greedyresult[0])
+
+
+    # Exact solution, the reference the other algorithms are measured against
+    optimalresult = heldKarp(randomgraph)
+    print("Optimal TSP tour length:", optimalresult[1])
 
 
     # Simulated Annealing Algorithm testing
-    # Run 100 annealing sessions and return basic statistical
-    # analysis of resulting tour lengths and time
-    simannealdata = []
-    simannealtimedata = []
+    # Run 100 annealing sessions (each the best of 10 anneals) in parallel
+    # and return basic statistical analysis of resulting tour lengths and time
     simnumruns = 100
-    for i in range (simnumruns):
-        startanneal = timeit.default_timer()
-        graph = SimAnnealingTSPGraph(randomgraph)
-        agent = SimAnnealingTSPAgent()
-        bestgraph = graph
-        count = 0
-        shufflecount = 0
-        while count < 10:
-            if shufflecount >= 1:
-                random.shuffle(tspgraph.pathlist)
-            tspgraph = agent.anneal(graph)
-            if tspgraph.graph.pathlength(tspgraph.pathlist) < bestgraph.graph.pathlength(bestgraph.pathlist):
-                bestgraph = tspgraph
-            count +=1
-            shufflecount +=1
-        simelapsed = timeit.default_timer() - startanneal
-        simannealdata.append(bestgraph.graph.pathlength(bestgraph.pathlist))
-        simannealtimedata.append(simelapsed)
-        print "Final length of Simulated Annealing TSP Tour for run",i+1,":", bestgraph.graph.pathlength(bestgraph.pathlist)
-        # print "Final Simulated Annealing TSP Algorithm path-list for run",i+1,":", bestgraph.pathlist
+    simresults = runExperiment(randomgraph, 'anneal', simnumruns, seed, workers)
+    for run in simresults:
+        print("Final length of Simulated Annealing TSP Tour for run", run.index+1, ":", run.length)
+        # print("Final Simulated Annealing TSP Algorithm path-list for run", run.index+1, ":", run.tour)
+    simannealdata = [run.length for run in simresults]
+    simannealtimedata = [run.elapsed for run in simresults]
 
 
     # Genetic Algorithm testing
-    # Run 100 instances of the genetic algorithm and return basic
+    # Run 100 instances of the genetic algorithm in parallel and return basic
     # statistical analysis of resulting tour lengths and time
     target_score = greedyresult[1]
-    geneticdata = []
-    genetictimedata = []
     gennumruns = 100
-    for j in range (gennumruns):
-        startgenetic = timeit.default_timer()
-        genetictsp = evolve(randomgraph, target_score)
-        print "Final length of Genetic TSP tour for run",j+1,":", genetictsp[1]
-        # print "Final Genetic TSP tour path-list for run",j+1,":", genetictsp[0].pathlist
-        geneticelapsed = timeit.default_timer() - startgenetic
-        geneticdata.append(genetictsp[1])
-        genetictimedata.append(geneticelapsed)
-
-
-    print "========================================================"
-    print "================== FINAL RESULTS ======================="
-    print "========================================================"
-
-    print "============= GREEDY ALGORITHM RESULTS ================="
-    print "Minimum tour length:", greedyresult[1]
-    print "Time elapsed:", elapsedgreedy, "seconds"
-    print "========================================================"
-
-    print "=========== SIMULATED ANNEALING RESULTS ================"
-    print "Out of", simnumruns, "runs:"
-    print "Minimum (best) value:", min(simannealdata)
-    print "Mean value:", float(sum(simannealdata))/len(simannealdata)
-    print "Range:", min(simannealdata), "to", max(simannealdata)
-    print "Minimum (best) time:", min(simannealtimedata), "seconds"
-    print "Mean time:", float(sum(simannealtimedata))/len(simannealtimedata), "seconds"
-    print "Range of times:", min(simannealtimedata), "to", max(simannealtimedata), "seconds"
-    print "========================================================"
-
-    print "============== GENETIC ALGORITHM RESULTS ==============="
-    print "Out of", gennumruns, "runs:"
-    print "Minimum (best) value:", min(geneticdata)
-    print "Mean value:", float(sum(geneticdata))/len(geneticdata)
-    print "Range:", min(geneticdata), "to", max(geneticdata)
-    print "Minimum (best) time:", min(genetictimedata), "seconds"
-    print "Mean time:", float(sum(genetictimedata))/len(genetictimedata), "seconds"
-    print "Range of times:", min(genetictimedata), "to", max(genetictimedata), "seconds"
-    print "========================================================"
+    genresults = runExperiment(randomgraph, 'evolve', gennumruns, seed, workers, target_score=target_score)
+    for run in genresults:
+        print("Final length of Genetic TSP tour for run", run.index+1, ":", run.length)
+        # print("Final Genetic TSP tour path-list for run", run.index+1, ":", run.tour)
+    geneticdata = [run.length for run in genresults]
+    genetictimedata = [run.elapsed for run in genresults]
+
+
+    print("========================================================")
+    print("================== FINAL RESULTS =======================")
+    print("========================================================")
+
+    print("============= GREEDY ALGORITHM RESULTS =================")
+    print("Minimum tour length:", greedyresult[1], "(optimal is", optimalresult[1], ")")
+    print("Time elapsed:", elapsedgreedy, "seconds")
+    print("========================================================")
+
+    print("=========== SIMULATED ANNEALING RESULTS ================")
+    print("Out of", simnumruns, "runs:")
+    print("Minimum (best) value:", min(simannealdata))
+    print("Mean value:", float(sum(simannealdata))/len(simannealdata))
+    print("Mean gap to optimal:", 100.0*(float(sum(simannealdata))/len(simannealdata)/optimalresult[1] - 1), "%")
+    print("Range:", min(simannealdata), "to", max(simannealdata))
+    print("Minimum (best) time:", min(simannealtimedata), "seconds")
+    print("Mean time:", float(sum(simannealtimedata))/len(simannealtimedata), "seconds")
+    print("Range of times:", min(simannealtimedata), "to", max(simannealtimedata), "seconds")
+    print("========================================================")
+
+    print("============== GENETIC ALGORITHM RESULTS ===============")
+    print("Out of", gennumruns, "runs:")
+    print("Minimum (best) value:", min(geneticdata))
+    print("Mean value:", float(sum(geneticdata))/len(geneticdata))
+    print("Mean gap to optimal:", 100.0*(float(sum(geneticdata))/len(geneticdata)/optimalresult[1] - 1), "%")
+    print("Range:", min(geneticdata), "to", max(geneticdata))
+    print("Minimum (best) time:", min(genetictimedata), "seconds")
+    print("Mean time:", float(sum(genetictimedata))/len(genetictimedata), "seconds")
+    print("Range of times:", min(genetictimedata), "to", max(genetictimedata), "seconds")
+    print("========================================================")
 
 if __name__ == '__main__':
     solve()
@@ -0,0 +1,198 @@
+# Authors: Josiah Bartlett and Tom Joyce
+# Purpose: read and write instances and tours: TSPLIB text files and a memory-mapped binary format
+
+import mmap
+import os
+import re
+import struct
+import numpy as np
+from weightedgraph import WeightedGraph
+from euclideangraph import EuclideanGraph
+
+# Binary files are a fixed 64-byte header followed by one raw little-endian C-order array:
+# magic, kind (MATRIX for a distance matrix, POINTS for n x 2 coordinates, TOUR for vertex ids),
+# rows, columns and the numpy dtype string, zero padded
+MAGIC = b'TSPBIN01'
+HEADER = struct.Struct('<8s8sQQ8s')
+HEADER_BYTES = 64
+KINDS = ('MATRIX', 'POINTS', 'TOUR')
+
+
+# @param path: file to write
+# @param kind: one of KINDS
+# @param array: one- or two-dimensional numpy array
+def writeArray(path, kind, array):
+    array = np.ascontiguousarray(array)
+    array = array.astype(array.dtype.newbyteorder('<'), copy=False)
+    columns = array.shape[1] if array.ndim == 2 else 0
+    header = HEADER.pack(MAGIC, kind.encode('ascii'), array.shape[0], columns, array.dtype.str.encode('ascii'))
+    with open(path, 'wb') as f:
+        f.write(header.ljust(HEADER_BYTES, b'\0'))
+        f.write(array.tobytes())
+
+# @param header: the first HEADER_BYTES bytes of a file
+# @return: (kind, shape, dtype), or None if this is not a binary file
+def _parseHeader(header):
+    if len(header) < HEADER_BYTES or header[:len(MAGIC)] != MAGIC:
+        return None
+    (magic, kind, rows, columns, dtype) = HEADER.unpack(header[:HEADER.size])
+    kind = kind.rstrip(b'\0').decode('ascii')
+    if kind not in KINDS:
+        raise ValueError("unknown binary file kind: %s" % kind)
+    shape = (rows, columns) if columns else (rows,)
+    return (kind, shape, np.dtype(dtype.rstrip(b'\0').decode('ascii')))
+
+# Maps a binary file read-only: O(1) whatever its size, and every process mapping the
+# same file shares the same pages of the page cache
+# @param path: a binary file
+# @return: (the mmap, kind, a read-only numpy view of the array); drop the view before closing the mmap
+def mapArray(path):
+    with open(path, 'rb') as f:
+        parsed = _parseHeader(f.read(HEADER_BYTES))
+        if parsed is None:
+            raise ValueError("%s is not a binary TSP file" % path)
+        (kind, shape, dtype) = parsed
+        size = HEADER_BYTES + int(np.prod(shape)) * dtype.itemsize
+        memory = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) if size > HEADER_BYTES else None
+    if memory is None: # an empty array cannot be mapped
+        return (None, kind, np.empty(shape, dtype=dtype))
+    return (memory, kind, np.ndarray(shape, dtype=dtype, buffer=memory, offset=HEADER_BYTES))
+
+# @param graph: a weighted graph; an EuclideanGraph without a cached matrix is stored as its points
+# @param path: file to write; the vertices are stored by id, so they read back as 0..n-1
+def writeInstance(graph, path):
+    if isinstance(graph, EuclideanGraph) and graph.distanceMatrix is None:
+        writeArray(path, 'POINTS', graph.coordinates)
+    else:
+        writeArray(path, 'MATRIX', graph.denseMatrix())
+
+# @param path: a binary instance file
+# @param cacheLimit: cacheLimit of the EuclideanGraph made from a POINTS file
+# @return: (the mmap, the graph over it); drop the graph before closing the mmap
+def openInstance(path, cacheLimit=2000):
+    (memory, kind, array) = mapArray(path)
+    if kind == 'MATRIX':
+        graph = WeightedGraph.fromMatrix(array)
+    elif kind == 'POINTS':
+        graph = EuclideanGraph(array, cacheLimit)
+    else:
+        raise ValueError("%s holds a %s, not an instance" % (path, kind.lower()))
+    graph.mappedPath = os.path.abspath(path)
+    return (memory, graph)
+
+# @param path: a binary instance file
+# @param cacheLimit: cacheLimit of the EuclideanGraph made from a POINTS file
+# @return: the graph, over a read-only mapping of the file that lives as long as the graph
+def readInstance(path, cacheLimit=2000):
+    return openInstance(path, cacheLimit)[1]
+
+# @param tour: list of vertices
+# @param path: file to write
+# @param graph: the graph of the tour, to store the vertices by id (default: the vertices are ids)
+def writeTour(tour, path, graph=None):
+    ids = graph.tourIds(tour) if graph is not None else np.asarray(tour)
+    writeArray(path, 'TOUR', ids.astype(np.int32))
+
+# @param path: a binary tour file
+# @param graph: the graph of the tour, to turn the ids back into its vertices
+# @return: the tour as a list of vertices (vertex ids if no graph is given)
+def readTour(path, graph=None):
+    (memory, kind, array) = mapArray(path)
+    if kind != 'TOUR':
+        raise ValueError("%s holds a %s, not a tour" % (path, kind.lower()))
+    ids = np.array(array, dtype=np.intp)
+    del array
+    if memory is not None:
+        memory.close()
+    return graph.tourVertices(ids) if graph is not None else ids.tolist()
+
+
+# TSPLIB EDGE_WEIGHT_FORMATs of symmetric explicit matrices: (triangle, include the diagonal);
+# the column-wise formats list the same numbers as the row-wise ones of the other triangle
+_TRIANGLES = {
+    'UPPER_ROW': ('upper', False), 'LOWER_COL': ('upper', False),
+    'LOWER_ROW': ('lower', False), 'UPPER_COL': ('lower', False),
+    'UPPER_DIAG_ROW': ('upper', True), 'LOWER_DIAG_COL': ('upper', True),
+    'LOWER_DIAG_ROW': ('lower', True), 'UPPER_DIAG_COL': ('lower', True),
+}
+
+# @param text: contents of a TSPLIB file
+# @return: (specification map of the header, sectionMap[name] -> text of that data section)
+def _tsplibParts(text):
+    specification = {}
+    sections = {}
+    parts = re.split(r'^\s*([A-Z_]+_SECTION)\s*:?\s*$', text, flags=re.MULTILINE)
+    for line in parts[0].splitlines():
+        if ':' in line:
+            (key, value) = line.split(':', 1)
+            specification[key.strip().upper()] = value.strip()
+    for k in range(1, len(parts) - 1, 2):
+        sections[parts[k]] = re.split(r'^\s*EOF', parts[k + 1], maxsplit=1, flags=re.MULTILINE)[0]
+    return (specification, sections)
+
+# @param path: a TSPLIB file of a symmetric TSP with EDGE_WEIGHT_TYPE EXPLICIT or EUC_2D
+# @param rounded: for EUC_2D, build the dense matrix of distances rounded to the nearest
+# integer, as TSPLIB defines them (and its optimal lengths assume), instead of an EuclideanGraph
+# @param cacheLimit: cacheLimit of the EuclideanGraph
+# @return: the graph, over vertex ids 0..n-1 (TSPLIB's 1..n, less one)
+def readTSPLIB(path, rounded=False, cacheLimit=2000):
+    with open(path) as f:
+        (specification, sections) = _tsplibParts(f.read())
+    if specification.get('TYPE', 'TSP').split()[0] != 'TSP':
+        raise ValueError("only symmetric TSP instances are supported, not %s" % specification['TYPE'])
+    n = int(specification['DIMENSION'])
+    weightType = specification.get('EDGE_WEIGHT_TYPE', 'EXPLICIT')
+    if weightType == 'EUC_2D':
+        rows = np.array(sections['NODE_COORD_SECTION'].split(), dtype=np.float64).reshape(-1, 3)
+        points = np.empty((n, 2))
+        points[rows[:, 0].astype(np.intp) - 1] = rows[:, 1:]
+        graph = EuclideanGraph(points, cacheLimit)
+        if not rounded:
+            return graph
+        matrix = np.empty((n, n), dtype=np.int32)
+        block = max(1, 2**22 // max(n, 1))
+        for first in range(0, n, block):
+            ids = np.arange(first, min(first + block, n))
+            matrix[ids] = np.floor(graph.distanceBlock(ids) + 0.5)
+        return WeightedGraph.fromMatrix(matrix)
+    if weightType != 'EXPLICIT':
+        raise ValueError("unsupported EDGE_WEIGHT_TYPE: %s" % weightType)
+
+    numbers = np.array(sections['EDGE_WEIGHT_SECTION'].split(), dtype=np.float64)
+    weightFormat = specification.get('EDGE_WEIGHT_FORMAT', 'FULL_MATRIX')
+    if weightFormat == 'FULL_MATRIX':
+        matrix = numbers[:n * n].reshape(n, n)
+    elif weightFormat in _TRIANGLES:
+        (triangle, diagonal) = _TRIANGLES[weightFormat]
+        offset = 0 if diagonal else 1
+        (first, second) = np.triu_indices(n, offset) if triangle == 'upper' else np.tril_indices(n, -offset)
+        matrix = np.zeros((n, n))
+        matrix[first, second] = numbers[:len(first)]
+        matrix[second, first] = numbers[:len(first)]
+    else:
+        raise ValueError("unsupported EDGE_WEIGHT_FORMAT: %s" % weightFormat)
+    if (matrix == np.round(matrix)).all() and np.abs(matrix).max(initial=0) < np.iinfo(np.int32).max:
+        matrix = matrix.astype(np.int32)
+    return WeightedGraph.fromMatrix(np.ascontiguousarray(matrix))
+
+# @param path: a TSPLIB .tour file
+# @return: the tour as a list of vertex ids 0..n-1
+def readTSPLIBTour(path):
+    with open(path) as f:
+        (specification, sections) = _tsplibParts(f.read())
+    tour = []
+    for v in sections['TOUR_SECTION'].split():
+        if v == '-1':
+            break
+        tour.append(int(v) - 1)
+    return tour
+
+# @param path: a binary instance file or a TSPLIB file
+# @param options: passed on to readInstance or readTSPLIB
+# @return: the graph in it
+def readGraph(path, **options):
+    with open(path, 'rb') as f:
+        binary = f.read(len(MAGIC)) == MAGIC
+    if binary:
+        return readInstance(path, **options)
+    return readTSPLIB(path, **options)
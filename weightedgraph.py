@@ -2,26 +2,184 @@
 # Purpose: implement a weighted graph data structure
 
 from graph import Graph
-from heapq import *
+import numpy as np
+from construction import nearestNeighborTour
+from csrgraph import CSRGraph, ShortestPathCache
 
 class WeightedGraph(Graph):
 
     """
     @param vertexSet: set of vertices
     @param edgeSet: set of (v,u,weight) tuples indicating edges
+    @param dense: if True, keep the weights only in a dense distance matrix
     Initializes adjacencyMap[v][u] -> weight of edge v->u
+    (or distanceMatrix[i][j] -> weight of edge between vertex ids i and j)
     """
-    def __init__(self, vertexSet, edgeSet):
-        self.adjacencyMap = {v:dict() for v in vertexSet}
+    def __init__(self, vertexSet, edgeSet, dense=False):
+        self.distanceMatrix = None
+        if dense:
+            self.adjacencyMap = None
+            self.__indexVertices(vertexSet)
+            self.__fillMatrix(edgeSet)
+        else:
+            self.adjacencyMap = {v:dict() for v in vertexSet}
+            for (v,u,weight) in edgeSet:
+                self.adjacencyMap[v][u] = weight
+                self.adjacencyMap[u][v] = weight
+
+    """
+    @param matrix: distanceMatrix[i][j] -> weight of edge between vertex ids i and j
+    @param vertices: list of vertices in id order (default 0..n-1)
+    @return: a dense WeightedGraph sharing the given matrix
+    """
+    @classmethod
+    def fromMatrix(cls, matrix, vertices=None):
+        graph = cls.__new__(cls)
+        graph.adjacencyMap = None
+        if vertices is None:
+            vertices = range(len(matrix))
+        graph.__indexVertices(vertices, True)
+        graph.distanceMatrix = matrix
+        return graph
+
+    """
+    @param vertexSet: set of vertices
+    @param ordered: if True, keep the given order instead of sorting
+    Initializes vertexOrder[i] -> vertex with id i, and vertexIds[v] -> id of v
+    """
+    def __indexVertices(self, vertexSet, ordered=False):
+        try:
+            self.vertexOrder = list(vertexSet) if ordered else sorted(vertexSet)
+        except TypeError:
+            self.vertexOrder = list(vertexSet)
+        self.vertexIds = {v:i for (i,v) in enumerate(self.vertexOrder)}
+        self.identityIds = self.vertexOrder == list(range(len(self.vertexOrder)))
+
+    """
+    @param edgeSet: iterable of (v,u,weight) tuples indicating edges
+    Fills distanceMatrix from the edges; missing edges are infinite.
+    The matrix is int32 if the graph is complete with integer weights, else float64.
+    """
+    def __fillMatrix(self, edgeSet):
+        n = len(self.vertexOrder)
+        matrix = np.full((n, n), np.inf)
+        np.fill_diagonal(matrix, 0)
+        ids = self.vertexIds
         for (v,u,weight) in edgeSet:
-            self.adjacencyMap[v][u] = weight
-            self.adjacencyMap[u][v] = weight
-    
+            matrix[ids[v], ids[u]] = weight
+            matrix[ids[u], ids[v]] = weight
+        if np.isfinite(matrix).all() and (matrix == np.round(matrix)).all() \
+                and np.abs(matrix).max(initial=0) < np.iinfo(np.int32).max:
+            matrix = matrix.astype(np.int32)
+        self.distanceMatrix = matrix
+
+    """
+    @return: distanceMatrix[i][j] -> weight of edge between vertex ids i and j
+    Built once from the adjacency map if this graph was not constructed dense;
+    afterwards pathlength uses the matrix instead of per-edge lookups.
+    """
+    def denseMatrix(self):
+        if self.distanceMatrix is None:
+            self.__indexVertices(self.adjacencyMap.keys())
+            self.__fillMatrix((v,u,self.adjacencyMap[v][u]) for v in self.adjacencyMap for u in self.adjacencyMap[v])
+        return self.distanceMatrix
+
+    """
+    @return: function (i, j) -> weight of edge between vertex ids i and j
+    """
+    def idWeights(self):
+        return self.denseMatrix().item
+
+    """
+    @param rows: array of vertex ids
+    @return: array whose row k holds the weights from vertex id rows[k] to every vertex id
+    """
+    def distanceBlock(self, rows):
+        return self.denseMatrix()[rows]
+
+    """
+    @param first, second: broadcastable arrays of vertex ids
+    @return: array of the weights of the edges between them
+    """
+    def pairWeights(self, first, second):
+        return self.denseMatrix()[first, second]
+
+    """
+    @param k: number of candidates per vertex
+    @return: (n x k) int32 array; row i lists the ids of the k vertices closest to vertex id i, nearest first
+    Computed a block of rows at a time with a partial sort, so memory stays O(n k) beyond the matrix.
+    """
+    def candidateNeighbors(self, k=10):
+        n = len(self.vertices())
+        k = max(0, min(k, n - 1))
+        neighbors = np.empty((n, k), dtype=np.int32)
+        if k == 0:
+            return neighbors
+        block = max(1, 2**22 // max(n, 1))
+        for first in range(0, n, block):
+            rows = np.arange(first, min(first + block, n))
+            weights = self.distanceBlock(rows).astype(np.float64)
+            weights[np.arange(len(rows)), rows] = np.inf
+            closest = np.argpartition(weights, k - 1, axis=1)[:, :k]
+            order = np.argsort(np.take_along_axis(weights, closest, axis=1), axis=1, kind='stable')
+            neighbors[rows] = np.take_along_axis(closest, order, axis=1)
+        return neighbors
+
+    """
+    @param pathlist: list of vertices
+    @return: array of the vertex ids along pathlist
+    """
+    def tourIds(self, pathlist):
+        if self.adjacencyMap is not None:
+            self.denseMatrix()
+        if self.identityIds:
+            return np.asarray(pathlist, dtype=np.intp)
+        ids = self.vertexIds
+        return np.fromiter((ids[v] for v in pathlist), np.intp, len(pathlist))
+
+    """
+    @param tour: array of vertex ids
+    @return: list of the vertices along tour
+    """
+    def tourVertices(self, tour):
+        if self.adjacencyMap is not None:
+            self.denseMatrix()
+        if self.identityIds:
+            return tour.tolist()
+        return [self.vertexOrder[i] for i in tour.tolist()]
+
+    """
+    @return: list of vertices in this graph
+    """
+    def vertices(self):
+        if self.adjacencyMap is None:
+            return list(self.vertexOrder)
+        return Graph.vertices(self)
+
+    """
+    @return: list of vertices adjacent to v
+    """
+    def neighborsOf(self, v):
+        if self.adjacencyMap is None:
+            i = self.vertexIds[v]
+            row = self.distanceMatrix[i]
+            if row.dtype.kind == 'f':
+                ids = np.flatnonzero(np.isfinite(row))
+            else:
+                ids = range(len(row))
+            return [self.vertexOrder[j] for j in ids if j != i]
+        return Graph.neighborsOf(self, v)
+
     """
     @params v,u: vertices
     @return: weight of edge v->u
     """
     def edgeWeight(self, v, u):
+        if self.adjacencyMap is None:
+            weight = self.distanceMatrix[self.vertexIds[v], self.vertexIds[u]]
+            if weight == np.inf or v == u:
+                raise KeyError(u)
+            return weight.item()
         return self.adjacencyMap[v][u]
 
     """
@@ -32,50 +190,63 @@ class WeightedGraph(Graph):
         parentMap = self.__dijkstra(v)
         return {u:self._Graph__path(u,parentMap) for u in parentMap}
     
+    """
+    @return: this graph in compressed sparse row form over vertex ids, with edge weights;
+    built once (from the adjacency map or the finite entries of the matrix) and cached
+    """
+    def csr(self):
+        if getattr(self, 'csrGraph', None) is None:
+            if self.adjacencyMap is None:
+                order = list(self.vertexOrder)
+                matrix = self.denseMatrix()
+                present = np.isfinite(matrix)
+                np.fill_diagonal(present, False)
+                (first, second) = np.nonzero(present)
+                weights = matrix[first, second]
+            else:
+                order = self.vertices()
+                ids = {v:i for (i,v) in enumerate(order)}
+                first, second, weights = [], [], []
+                for v in order:
+                    for (u, weight) in self.adjacencyMap[v].items():
+                        first.append(ids[v])
+                        second.append(ids[u])
+                        weights.append(weight)
+            self.csrGraph = CSRGraph.fromEdges(len(order), first, second, weights, symmetric=False, vertexOrder=order)
+            self.csrIds = {v:i for (i,v) in enumerate(order)}
+            self.pathCache = ShortestPathCache(self.csrGraph)
+        return self.csrGraph
+
+    """
+    Forgets everything derived from the edges (the CSR form and the cached shortest paths,
+    and the dense matrix if the weights live in the adjacency map); call after changing an edge
+    """
+    def invalidate(self):
+        self.csrGraph = None
+        self.pathCache = None
+        if self.adjacencyMap is not None:
+            self.distanceMatrix = None
+
     """
     @param v: vertex
     @return: parentMap[u] -> predecessor of u along minimum-weight path from v
+    Each source is searched once; later calls reuse the cached result until invalidate
     """
     def __dijkstra(self, v):
-        parentMap = {v:v}
-        distanceMap = {v:0}
-        frontier = [(0,v)]
-        ignoreSet = set()
-        while len(frontier) > 0:
-            (pdist,p) = heappop(frontier)
-            if p not in ignoreSet:
-                ignoreSet.add(p)
-                for c in self.neighborsOf(p):
-                    d = pdist + self.edgeWeight(p,c)
-                    if c not in parentMap or distanceMap[c] > d:
-                        parentMap[c] = p
-                        distanceMap[c] = d
-                        heappush(frontier, (d,c))
-        return parentMap
+        csr = self.csr()
+        (distance, parent) = self.pathCache.get(self.csrIds[v])
+        reached = np.flatnonzero(parent >= 0)
+        return dict(zip(csr.verticesOf(reached), csr.verticesOf(parent[reached])))
 
     """
     authors: Josiah Bartlett and Tom Joyce
     @param v: start/end vertex
     @return: minimum weight TSP tour list and length
+    Nearest-neighbor construction over the distance matrix (see construction.py);
+    raises ValueError if some vertex has no unvisited neighbor
     """
     def greedytsp(self, v):
-        sum = 0
-        start = v
-        markedvertices = [v]
-        vertexlist = self.vertices()
-        while len(markedvertices) < len(vertexlist):
-            weightdict = {}
-            for i in self.neighborsOf(v):
-                if i not in markedvertices:
-                    weight = self.edgeWeight(v, i)
-                    weightdict[i] = weight
-            if len(weightdict) > 0:
-                v = min(weightdict, key=lambda k: weightdict[k])
-                sum = sum + weightdict[v]
-                markedvertices.append(v)
-
-        sum = sum + self.edgeWeight(v, start)
-        return (markedvertices, sum)
+        return nearestNeighborTour(self, v)
 
     """
     authors: Josiah Bartlett and Tom Joyce
@@ -83,6 +254,11 @@ class WeightedGraph(Graph):
     @return: minimum weight TSP tour list and length
     """
     def pathlength(self, pathlist):
+        if self.distanceMatrix is not None:
+            if len(pathlist) < 2:
+                return 0
+            tour = self.tourIds(pathlist)
+            return self.distanceMatrix[tour, np.roll(tour, -1)].sum().item()
         length = 0
         i = 0
         if len(pathlist) > 1:
@@ -101,13 +277,13 @@ class WeightedGraph(Graph):
     @return: the cheapest path [a...b] that passes through c
     """
     def pathThrough(self,a,b,c):
-        pathMapA = self.shortestPathsFrom(a)
-        pathMapC = self.shortestPathsFrom(c)
-        
-        for v in pathMapC(b):
-            pathMapA[c].append(v)
-        
-        return pathMapA
+        # The edges are undirected, so one search from c gives both halves
+        parentMap = self.__dijkstra(c)
+        path = self._Graph__path(a, parentMap)
+        path.reverse()
+        path.pop()
+        path.extend(self._Graph__path(b, parentMap))
+        return path
          
         
     """